@@ -1,128 +1,204 @@
-from flask import Flask
-import pandas as pd
-from bs4 import BeautifulSoup as bs
-import requests
+from flask import Flask, Response, jsonify, request, stream_with_context
 import json
-import html2text
 import random
 from datetime import datetime, timedelta
-from models import DatabaseService, Commodity
+from models import DatabaseService, Commodity, upsert_commodities, read_latest_commodities, commodity_frame_records, append_price_ticks, iter_price_history, partition_price_ticks_monthly
+from commodity_snapshot import JsonSnapshot
+from commodity_analytics import compute_analytics
+from commodity_parsing import RAW_COLUMNS, parse_commodity_table, commodity_records
+from commodity_scraper import extract_table
+from commodity_fetcher import ChangeDetector, CommodityFetcher, load_sources, rows_digest
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import atexit
+import os
 
 app = Flask(__name__)
 app.secret_key = "super secret key"
 
-
-def main(session):
+DB = DatabaseService(
+    db_url=os.environ.get("DATABASE_URL", "mysql+pymysql://root:@localhost:3306/rwacof_analytics"),
+    pool_size=int(os.environ.get("DB_POOL_SIZE", "5")),
+    max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+    pool_recycle=int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+)
+
+# Latest /api/commodities payload, replaced by the scheduled refresh
+COMMODITY_SNAPSHOT = JsonSnapshot()
+
+# /api/analytics aggregates of that snapshot, recomputed only when it changes
+ANALYTICS_SNAPSHOT = JsonSnapshot({})
+
+# Months of spare monthly partitions to keep on the MySQL price history table (0 = unpartitioned)
+PRICE_TICK_PARTITION_MONTHS = int(os.environ.get("PRICE_TICK_PARTITION_MONTHS", "0"))
+
+# Pages pulled on each refresh: name, url and position of the quote table on the page
+COMMODITY_SOURCES_CONFIG = os.environ.get(
+    "COMMODITY_SOURCES_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "commodity_sources.json")
+)
+COMMODITY_SOURCES = load_sources(COMMODITY_SOURCES_CONFIG)
+FETCHER = CommodityFetcher()
+
+# Skips refreshes whose sources or extracted rows did not change, and counts refresh outcomes
+CHANGE_DETECTOR = ChangeDetector()
+
+
+def store_commodities(session, heads, rows):
+    """Write the scraped table to data.csv and store it; returns the latest quote of every commodity."""
+    with open("data.csv", "w") as f:
+        f.write(",".join(heads) + "\n")
+        for row in rows:
+            f.write(",".join(row) + "\n")
+
+    dataset = commodity_records(parse_commodity_table(rows).drop_duplicates('agricultural'))
+    # A NULL date never matches the (agricultural, date) key, so the row would be inserted again on every refresh
+    quotes = [row for row in dataset if row['date'] is not None]
+    if len(quotes) < len(dataset):
+        print(f"Skipping {len(dataset) - len(quotes)} commodity rows without a parseable date")
+    written = upsert_commodities(session, quotes)
+    append_price_ticks(session, dataset)
+    session.commit()
+    print(f"Upserted {written} of {len(quotes)} commodity rows")
+    return commodity_frame_records(read_latest_commodities(session))
+
+
+def main_multi_source(session, sources=None):
+    """Fetch every configured source concurrently and store their commodity tables."""
     try:
-        with open("data.csv", "w") as f:
-            session.query(Commodity).delete()
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-            html = requests.get("https://tradingeconomics.com/commodities", headers=headers)
-
-            if html.status_code != 200:
-                print("Failed to retrieve the page")
-                return
-
-            soup = bs(html.content, 'html.parser')
-            tables = soup.find_all('table')
-            table = tables[2]  
-
-            head = table.find('thead').find_all('th')
-            body = table.find('tbody').find_all('tr')
-            heads = [" "] * len(head)
-
-            for i, th in enumerate(head):
-                heads[i % 9] = html2text.html2text(th.text).strip()
-            f.write(",".join(heads) + "\n")
-
-            row = [""] * len(head)
-            dataset = []
-            for tr in body:
-                tds = tr.find_all('td')
-                for j, td in enumerate(tds):
-                    row[j % 9] = html2text.html2text(td.text).strip()
-                if len(row) < 9:
-                    continue
-                new_item = Commodity(
-                    agricultural=row[0],
-                    price=row[1],
-                    day=row[2],
-                    percentage=row[3],
-                    weekly=row[4],
-                    monthly=row[5],
-                    ytd=row[6],
-                    yoy=row[7],
-                    date=row[8]
-                )
-                session.add(new_item)
-                dataset.append(new_item.serialize())
-                f.write(",".join(row) + "\n")
-
-            session.commit()
-            return [commodity.serialize() for commodity in session.query(Commodity).all()]
+        sources = COMMODITY_SOURCES if sources is None else sources
+        pages = FETCHER.fetch_all(source['url'] for source in sources)
+        fetched = [page for page in pages.values() if not isinstance(page, Exception)]
+        if fetched and len(fetched) == len(pages) and CHANGE_DETECTOR.digest is not None \
+                and not any(page.modified for page in fetched):
+            CHANGE_DETECTOR.count("skipped_not_modified")
+            print("Commodity sources not modified, skipping refresh")
+            return
+
+        heads, rows = None, []
+        for source in sources:
+            page = pages[source['url']]
+            if isinstance(page, Exception):
+                print(f"Skipping source {source['name']}: {page}")
+                continue
+            try:
+                source_heads, source_rows = extract_table(page.body, source['table_index'])
+            except Exception as e:
+                # An empty or malformed page (e.g. an lxml ParserError) only drops this source
+                print(f"Skipping source {source['name']}: no table {source['table_index']} on {source['url']} ({e!r})")
+                continue
+            if len(source_heads) != len(RAW_COLUMNS):
+                print(f"Skipping source {source['name']}: unexpected columns {source_heads}")
+                continue
+            heads = ["Commodity"] + source_heads[1:]
+            rows.extend(source_rows)
+
+        if not rows:
+            CHANGE_DETECTOR.count("failed")
+            print("No commodity source returned data")
+            return
+        digest = rows_digest(rows)
+        if not CHANGE_DETECTOR.changed(digest):
+            FETCHER.commit_validators()
+            CHANGE_DETECTOR.count("skipped_unchanged_rows")
+            print("Commodity rows unchanged, skipping refresh")
+            return
+        data = store_commodities(session, heads, rows)
+        CHANGE_DETECTOR.stored(digest)
+        # Only now may a 304 stand for these pages; a failed store refetches them in full
+        FETCHER.commit_validators()
+        CHANGE_DETECTOR.count("stored")
+        return data
     except Exception as e:
         print(f"Error during main execution: {e}")
         session.rollback()
+        CHANGE_DETECTOR.count("failed")
         return {"error": str(e)}
 
 
+def refresh_commodities():
+    """Scrape and store the commodities, then publish them as the served snapshot."""
+    session = DB.create_session()
+    try:
+        if PRICE_TICK_PARTITION_MONTHS:
+            partition_price_ticks_monthly(DB.engine, PRICE_TICK_PARTITION_MONTHS)
+        data = main_multi_source(session)
+    finally:
+        DB.remove_session()
+    if isinstance(data, list):
+        changed = COMMODITY_SNAPSHOT.publish(data)
+        if changed:
+            ANALYTICS_SNAPSHOT.publish(compute_analytics(data))
+        print(f"Commodity snapshot refreshed (version {COMMODITY_SNAPSHOT.version}, changed={changed})")
+
+
+@app.teardown_appcontext
+def remove_session(exception=None):
+    DB.remove_session()
+
 @app.get("/")
 def index():
     return "Hello World"
 
+def snapshot_response(snapshot):
+    body, etag, version = snapshot.current()
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['X-Snapshot-Version'] = str(version)
+    return response.make_conditional(request)
+
 @app.route("/api/commodities")
 def get_commodities():
-    main(session)
-    data = session.query(Commodity).all()
-    return json.dumps([d.serialize() for d in data]), {'Content-Type': 'application/json'}
+    return snapshot_response(COMMODITY_SNAPSHOT)
+
+@app.route("/api/commodities/<path:name>/history")
+def get_commodity_history(name):
+    days = request.args.get("days", "90")
+    if not days.isdigit():
+        return jsonify({"error": f"days must be a non-negative integer, got {days!r}"}), 400
+    days = int(days)
+    start = datetime.now() - timedelta(days=days)
+
+    def generate():
+        # Encode ticks as they stream from the database instead of building the whole list.
+        # This runs after the view has returned, so it opens and removes its own session.
+        try:
+            yield "["
+            for i, tick in enumerate(iter_price_history(DB.create_session(), name, start)):
+                yield ("," if i else "") + json.dumps(tick)
+            yield "]"
+        finally:
+            DB.remove_session()
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+@app.route("/api/refresh_stats")
+def refresh_stats():
+    """How scheduled refreshes ended: stored, skipped (not modified / unchanged rows) or failed."""
+    return json.dumps(CHANGE_DETECTOR.stats()), {'Content-Type': 'application/json'}
+
+@app.route("/api/db_pool_stats")
+def db_pool_stats():
+    """Connection pool size and checked-in/out connections."""
+    return json.dumps(DB.pool_stats()), {'Content-Type': 'application/json'}
 
 @app.route("/api/analytics")
 def analytics():
-    data = session.query(Commodity).all()
-    df = pd.DataFrame([d.serialize() for d in data])
-
-    for col in ['price', 'percentage', 'weekly', 'monthly', 'ytd', 'yoy']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    result = {
-        "average_price": round(df['price'].mean(), 2),
-        "min_price": {
-            "commodity": df.loc[df['price'].idxmin()]['agricultural'],
-            "price": df['price'].min()
-        },
-        "max_price": {
-            "commodity": df.loc[df['price'].idxmax()]['agricultural'],
-            "price": df['price'].max()
-        },
-        "top_gainers": df.sort_values(by='percentage', ascending=False).head(3)[['agricultural', 'percentage']].to_dict(orient='records'),
-        "top_losers": df.sort_values(by='percentage').head(3)[['agricultural', 'percentage']].to_dict(orient='records'),
-        "ytd": {
-            "positive": int((df['ytd'] > 0).sum()),
-            "negative": int((df['ytd'] < 0).sum())
-        }
-    }
-
-    return json.dumps(result), {'Content-Type': 'application/json'}
-
+    return snapshot_response(ANALYTICS_SNAPSHOT)
 
 
 if __name__ == "__main__":
     try:
-        DB = DatabaseService(db_url="mysql+pymysql://root:@localhost:3306/rwacof_analytics")
-        DB.drop_all()
+        # Price history survives restarts; only the latest-quote table is rebuilt
+        Commodity.__table__.drop(DB.engine, checkfirst=True)
         DB.create_all()
-        session = DB.create_session()
 
         scheduler = BackgroundScheduler()
         scheduler.start()
 
         scheduler.add_job(
-            func=lambda: main(session),
+            func=refresh_commodities,
             trigger=IntervalTrigger(minutes=30),
+            next_run_time=datetime.now(),
             id='refresh_commodities',
             name='Fetch commodity data every 30 minutes',
             replace_existing=True
@@ -136,4 +212,5 @@ if __name__ == "__main__":
         print(f"Error: {e}")
     finally:
         print("Session Closed")
-        session.close_all()
+        DB.remove_session()
+        DB.engine.dispose()
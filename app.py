@@ -1,11 +1,16 @@
-from flask import Flask, jsonify, send_file, request
+from flask import Flask, Response, jsonify, send_file, request, stream_with_context
 import pandas as pd
 import numpy as np
-import random
 from datetime import datetime, timedelta
 import os
 import logging
-from functools import lru_cache
+from calendar_features import (HOLIDAY_WINDOW_DAYS, RECURRING_HOLIDAYS, OutbreakIndex, build_calendar,
+                               days_to_holiday, load_outbreaks, month_windows)
+from dataset_cache import DatasetCache, config_fingerprint
+from partitioned_dataset import OUTPUT_FILES, save_cached_dataset, stream_csv, write_partitioned
+from web_helpers import download_partitions
+from seeding import (MASTER_SEED, DRUG_DATABASE_STREAM, DAILY_STREAM, daily_uniforms, label_column,
+                     scaled_integers, seed_from_request, stream_rng)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -57,23 +62,24 @@ ATC_CATEGORIES = {
     }
 }
 
-# Create a drug database with more realistic attributes
-DRUG_DATABASE = {}
-for atc_code, data in ATC_CATEGORIES.items():
-    for drug in data["examples"]:
-        base_price = round(np.random.uniform(2.5, 50.0), 2)
-        effectiveness = np.random.randint(3, 6)
-        time_on_market = np.random.randint(6, 120)
-        
-        DRUG_DATABASE[drug] = {
+def build_drug_database(seed=MASTER_SEED):
+    """Create a drug database with more realistic attributes, drawing each drug from its own stream."""
+    database = {}
+    drugs = [(atc_code, drug) for atc_code, data in ATC_CATEGORIES.items() for drug in data["examples"]]
+    for i, (atc_code, drug) in enumerate(drugs):
+        rng = stream_rng(seed, DRUG_DATABASE_STREAM, i)
+        database[drug] = {
             "atc_code": atc_code,
-            "base_price": base_price,
-            "effectiveness": effectiveness,
-            "time_on_market": time_on_market,
-            "base_demand": np.random.randint(100, 1000),
-            "typical_prescription_duration": np.random.randint(3, 30),  # Days
-            "shelf_life": np.random.randint(12, 36)  # Months
+            "base_price": round(float(rng.uniform(2.5, 50.0)), 2),
+            "effectiveness": int(rng.integers(3, 6)),
+            "time_on_market": int(rng.integers(6, 120)),
+            "base_demand": int(rng.integers(100, 1000)),
+            "typical_prescription_duration": int(rng.integers(3, 30)),  # Days
+            "shelf_life": int(rng.integers(12, 36))  # Months
         }
+    return database
+
+DRUG_DATABASE = build_drug_database(MASTER_SEED)
 
 # Rwanda provinces and healthcare centers
 RWANDA_PROVINCES = ["Kigali", "Northern", "Eastern", "Southern", "Western"]
@@ -169,35 +175,13 @@ DEMOGRAPHIC_DATA = {
     }
 }
 
-# Rwanda holidays for realism
-RWANDA_HOLIDAYS = [
-    datetime(2024, 1, 1),   # New Year's Day
-    datetime(2024, 1, 2),   # Day after New Year
-    datetime(2024, 2, 1),   # Heroes' Day
-    datetime(2024, 4, 7),   # Genocide Memorial Day (week-long impact)
-    datetime(2024, 4, 8),
-    datetime(2024, 4, 9),
-    datetime(2024, 4, 10),
-    datetime(2024, 4, 11),
-    datetime(2024, 4, 12),
-    datetime(2024, 4, 13),
-    datetime(2024, 5, 1),   # Labor Day
-    datetime(2024, 7, 1),   # Independence Day
-    datetime(2024, 7, 4),   # Liberation Day
-    datetime(2024, 8, 15),  # Assumption Day
-    datetime(2024, 12, 25), # Christmas Day
-    datetime(2024, 12, 26)  # Boxing Day
-]
-
-# Rwanda-specific disease outbreaks (hypothetical)
-DISEASE_OUTBREAKS = [
-    {"start_date": datetime(2024, 3, 15), "end_date": datetime(2024, 4, 30), 
-     "disease": "Respiratory Infection", "affected_atc": ["R03", "R06", "N02BE/B"], "intensity": 1.8},
-    {"start_date": datetime(2024, 9, 1), "end_date": datetime(2024, 10, 15), 
-     "disease": "Malaria Surge", "affected_atc": ["N02BE/B"], "intensity": 1.6},
-    {"start_date": datetime(2024, 11, 10), "end_date": datetime(2024, 12, 20), 
-     "disease": "Gastrointestinal Outbreak", "affected_atc": ["N02BA", "N02BE/B"], "intensity": 1.5}
-]
+# Rwanda-specific disease outbreaks (hypothetical), indexed by ATC code for fast date lookups.
+# Holidays recur every year and come from calendar_features.RECURRING_HOLIDAYS.
+DISEASE_OUTBREAKS_CONFIG = os.environ.get(
+    "DISEASE_OUTBREAKS_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "disease_outbreaks.json")
+)
+DISEASE_OUTBREAKS = load_outbreaks(DISEASE_OUTBREAKS_CONFIG)
+OUTBREAK_INDEX = OutbreakIndex(DISEASE_OUTBREAKS)
 
 def get_rwanda_season(month):
     """Return Rwanda's season for the given month."""
@@ -210,34 +194,39 @@ def get_rwanda_season(month):
     else:
         return "Urugaryi"    # Short dry (Dec–Feb)
 
-@lru_cache(maxsize=366)
 def is_holiday_or_near(date):
     """Check if date is a holiday or within 3 days of one."""
-    holiday_proximity = min((abs((date - h).days) for h in RWANDA_HOLIDAYS), default=100)
-    if holiday_proximity <= 3:
+    holiday_proximity = days_to_holiday(date)
+    if holiday_proximity <= HOLIDAY_WINDOW_DAYS:
         return 1
     return 0
 
 def is_during_outbreak(date, atc_code):
     """Return outbreak intensity factor if date falls during an outbreak affecting the ATC code."""
-    for outbreak in DISEASE_OUTBREAKS:
-        if (outbreak["start_date"] <= date <= outbreak["end_date"] and 
-                atc_code in outbreak["affected_atc"]):
-            return outbreak["intensity"]
-    return 1.0
+    return OUTBREAK_INDEX.intensity_on(atc_code, date)
 
-def generate_supply_chain_delay(province, date):
-    """Generate more realistic supply chain delays based on location and season."""
-    base_weights = {
-        "Kigali": [0.7, 0.2, 0.08, 0.02],
-        "Northern": [0.5, 0.3, 0.15, 0.05],
-        "Eastern": [0.5, 0.25, 0.15, 0.1],
-        "Southern": [0.5, 0.25, 0.15, 0.1],
-        "Western": [0.4, 0.3, 0.2, 0.1]
-    }
-    
-    season = get_rwanda_season(date.month)
-    weights = base_weights[province].copy()
+# Supply chain delay categories and per-province weights (None, Low, Medium, High)
+SUPPLY_CHAIN_DELAY_LEVELS = ["None", "Low", "Medium", "High"]
+SUPPLY_CHAIN_DELAY_WEIGHTS = {
+    "Kigali": [0.7, 0.2, 0.08, 0.02],
+    "Northern": [0.5, 0.3, 0.15, 0.05],
+    "Eastern": [0.5, 0.25, 0.15, 0.1],
+    "Southern": [0.5, 0.25, 0.15, 0.1],
+    "Western": [0.4, 0.3, 0.2, 0.1]
+}
+
+# Geographic price factor per province
+GEO_PRICE_FACTOR = {
+    "Kigali": 1.1,       # Higher prices in capital
+    "Northern": 0.95,
+    "Eastern": 0.9,
+    "Southern": 0.92,
+    "Western": 0.93
+}
+
+def get_supply_chain_weights(province, season):
+    """Return the delay category weights for a province in the given season."""
+    weights = list(SUPPLY_CHAIN_DELAY_WEIGHTS[province])
     
     if (season in ["Itumba", "Umuhindo"]):  # Rainy seasons
         # Shift weight from "None" to higher delay categories
@@ -246,37 +235,35 @@ def generate_supply_chain_delay(province, date):
         weights[1] += shift * 0.4
         weights[2] += shift * 0.4
         weights[3] += shift * 0.2
-    
-    return random.choices(["None", "Low", "Medium", "High"], weights=weights)[0]
+    return weights
+
+def generate_supply_chain_delay(province, date, rng):
+    """Generate more realistic supply chain delays based on location and season."""
+    weights = np.array(get_supply_chain_weights(province, get_rwanda_season(date.month)))
+    return SUPPLY_CHAIN_DELAY_LEVELS[rng.choice(len(weights), p=weights / weights.sum())]
 
-def generate_drug_price(drug_name, date, province):
+def generate_drug_price(drug_name, date, province, rng):
     """Generate price variations based on multiple factors."""
     base_price = DRUG_DATABASE[drug_name]["base_price"]
     
     # Geographic factor
-    geo_factor = {
-        "Kigali": 1.1,       # Higher prices in capital
-        "Northern": 0.95,
-        "Eastern": 0.9,
-        "Southern": 0.92,
-        "Western": 0.93
-    }[province]
+    geo_factor = GEO_PRICE_FACTOR[province]
     
     # Time-based factor (subtle price increases over time)
     days_since_start = (date - datetime(2024, 1, 1)).days
     time_factor = 1 + (days_since_start / 365 * 0.05)  # Up to 5% increase over the year
     
     # Random fluctuation
-    random_factor = random.uniform(0.97, 1.03)
+    random_factor = rng.uniform(0.97, 1.03)
     
     return round(base_price * geo_factor * time_factor * random_factor, 2)
 
-def generate_dataset(start_date, end_date):
-    """Generate the synthetic dataset for a single pharmacy in Kigali, with units_sold as pure random noise and no health center columns."""
+def generate_dataset_rows(start_date, end_date, seed=MASTER_SEED):
+    """Generate the synthetic dataset one row at a time from a single stream (reference implementation)."""
     logger.info(f"Generating data for single pharmacy from {start_date} to {end_date} (units_sold is random noise, no health center columns)")
     rows = []
     date_range = pd.date_range(start_date, end_date)
-    rng = np.random.default_rng(42)  # Seed for reproducibility
+    rng = np.random.default_rng(seed)  # Seed for reproducibility
 
     # Define your pharmacy's attributes
     pharmacy_name = "Downtown Pharmacy"
@@ -289,8 +276,8 @@ def generate_dataset(start_date, end_date):
     for drug_name, drug_data in DRUG_DATABASE.items():
         atc_code = drug_data["atc_code"]
         for date in date_range:
-            supply_delay = generate_supply_chain_delay(province, date)
-            price = generate_drug_price(drug_name, date, province)
+            supply_delay = generate_supply_chain_delay(province, date, rng)
+            price = generate_drug_price(drug_name, date, province, rng)
             promotion = rng.choice([0, 1])
             effectiveness = drug_data["effectiveness"]
             time_on_market = drug_data["time_on_market"]
@@ -330,6 +317,123 @@ def generate_dataset(start_date, end_date):
     logger.info(f"Generated {len(rows)} data points for single pharmacy (random units_sold)")
     return pd.DataFrame(rows)
 
+def generate_dataset_columnar(start_date, end_date, seed=MASTER_SEED):
+    """Generate the synthetic dataset with one NumPy pass per column over the drug x date grid."""
+    logger.info(f"Generating columnar data for single pharmacy from {start_date} to {end_date}")
+    date_range = pd.date_range(start_date, end_date)
+
+    province = "Kigali"
+    center_type = "pharmacy"
+    province_demographics = DEMOGRAPHIC_DATA[province]
+
+    drug_names = list(DRUG_DATABASE)
+    drugs = [DRUG_DATABASE[name] for name in drug_names]
+    n_dates = len(date_range)
+    n = len(drugs) * n_dates
+
+    # Drug-major layout, matching the row-by-row generator
+    drug_idx = np.repeat(np.arange(len(drugs)), n_dates)
+    date_idx = np.tile(np.arange(n_dates), len(drugs))
+    dates = np.tile(date_range.values, len(drugs))
+    single = np.zeros(n, dtype=np.int64)  # Codes for columns holding one constant label
+
+    # Per-date columns from the calendar table, computed once and broadcast to every drug
+    atc_codes = [d["atc_code"] for d in drugs]
+    calendar = build_calendar(start_date, end_date, OUTBREAK_INDEX, sorted(set(atc_codes)))
+    seasons = calendar["Season"].to_numpy()
+    holidays = calendar["Holiday_Week"].to_numpy()
+    time_factor = 1 + ((date_range - datetime(2024, 1, 1)).days.to_numpy() / 365 * 0.05)
+
+    # Per-drug attributes
+    base_price = np.array([d["base_price"] for d in drugs])
+    effectiveness = np.array([d["effectiveness"] for d in drugs], dtype=np.int64)
+    time_on_market = np.array([d["time_on_market"] for d in drugs], dtype=np.int64)
+    shelf_life_days = np.array([d["shelf_life"] * 30 for d in drugs], dtype=np.int64)
+    outbreak = calendar[[f"Outbreak_{atc}" for atc in atc_codes]].to_numpy().T.ravel()
+
+    # Uniform draws per drug: delay, price, promotion, competitors, units, stock entry,
+    # expiration, stock buffer, sale hour, sale minute
+    u = np.stack([
+        daily_uniforms(seed, (DAILY_STREAM, i), 10, (), date_range) for i in range(len(drugs))
+    ], axis=1).reshape(10, n)
+
+    # Supply chain delay: inverse-CDF sampling with per-row (per-season) weights
+    season_cum = {season: np.cumsum(get_supply_chain_weights(province, season)) for season in set(seasons)}
+    cum_weights = np.array([season_cum[s] for s in seasons]).reshape(n_dates, len(SUPPLY_CHAIN_DELAY_LEVELS))
+    delay_idx = (u[0][:, None] > cum_weights[date_idx]).sum(axis=1)
+    delay_idx = np.minimum(delay_idx, len(SUPPLY_CHAIN_DELAY_LEVELS) - 1)
+
+    price = np.round(
+        base_price[drug_idx] * GEO_PRICE_FACTOR[province] * time_factor[date_idx] * (0.97 + 0.06 * u[1]), 2
+    )
+    promotion = scaled_integers(u[2], 0, 2)
+    competitors = scaled_integers(u[3], 2, 8)
+    units_sold = scaled_integers(u[4], 0, 1000)  # Pure random noise
+    stock_entry_timestamp = dates - scaled_integers(u[5], 5, 30).astype("timedelta64[D]")
+    expiration_date = dates + scaled_integers(u[6], 30, shelf_life_days[drug_idx]).astype("timedelta64[D]")
+    available_stock = units_sold + scaled_integers(u[7], 10, 50)
+    sale_minutes = scaled_integers(u[8], 7, 22) * 60 + scaled_integers(u[9], 0, 60)
+    sale_timestamp = dates + sale_minutes.astype("timedelta64[m]")
+
+    df = pd.DataFrame({
+        "Drug_ID": label_column(drug_names, drug_idx),
+        "ATC_Code": label_column(atc_codes, drug_idx),
+        "Date": dates,
+        "Province": label_column([province], single),
+        "Population_Density": label_column([province_demographics["population_density"]], single),
+        "Income_Level": label_column([province_demographics["income_level"]], single),
+        "Pharmacy_Type": label_column([center_type], single),
+        "units_sold": units_sold,
+        "Price_Per_Unit": price,
+        "Supply_Chain_Delay": label_column(SUPPLY_CHAIN_DELAY_LEVELS, delay_idx),
+        "Season": label_column(seasons, date_idx),
+        "Effectiveness_Rating": effectiveness[drug_idx],
+        "Promotion": promotion,
+        "Holiday_Week": holidays[date_idx],
+        "Disease_Outbreak": np.round(outbreak, 2),
+        "Competitor_Count": competitors,
+        "Time_On_Market": time_on_market[drug_idx],
+        "sale_timestamp": sale_timestamp,
+        "stock_entry_timestamp": stock_entry_timestamp,
+        "expiration_date": expiration_date,
+        "available_stock": available_stock
+    })
+    logger.info(f"Generated {len(df)} data points for single pharmacy (columnar)")
+    return df
+
+def generate_dataset(start_date, end_date, engine="columnar", seed=MASTER_SEED):
+    """Generate the single-pharmacy dataset with the "columnar" (default) or "rows" engine."""
+    if engine == "rows":
+        return generate_dataset_rows(start_date, end_date, seed)
+    if engine == "columnar":
+        return generate_dataset_columnar(start_date, end_date, seed)
+    raise ValueError(f"Unknown engine: {engine}")
+
+def iter_dataset_chunks(start_date, end_date, seed=MASTER_SEED):
+    """Yield the synthetic dataset one calendar month at a time; rows match one call, ordered month by month."""
+    for chunk_start, chunk_end in month_windows(start_date, end_date):
+        yield generate_dataset_columnar(chunk_start, chunk_end, seed)
+
+# Two-tier (memory + disk) cache of generated datasets
+DATASET_CACHE = DatasetCache(cache_dir=os.environ.get("DATASET_CACHE_DIR", "dataset_cache"))
+
+# Bump whenever a code change alters the generated data, so cached datasets of older code are not served
+GENERATOR_VERSION = 1
+
+# Every configuration table that shapes the output; module constants, so hashed once rather than per request
+CONFIG_HASH = config_fingerprint(
+    ATC_CATEGORIES, DRUG_DATABASE, RWANDA_PROVINCES, HEALTHCARE_CENTERS, DEMOGRAPHIC_DATA, RECURRING_HOLIDAYS,
+    HOLIDAY_WINDOW_DAYS, DISEASE_OUTBREAKS, SUPPLY_CHAIN_DELAY_LEVELS, SUPPLY_CHAIN_DELAY_WEIGHTS, GEO_PRICE_FACTOR
+)
+
+def dataset_key(start_date, end_date, seed=MASTER_SEED):
+    return DATASET_CACHE.key("app.single_pharmacy", CONFIG_HASH, generator_version=GENERATOR_VERSION,
+                             start_date=start_date, end_date=end_date, engine="columnar", seed=seed)
+
+def cached_generate_dataset(start_date, end_date, seed=MASTER_SEED):
+    """generate_dataset behind DATASET_CACHE, keyed on the parameters and the generator configuration."""
+    return DATASET_CACHE.get_or_generate(dataset_key(start_date, end_date, seed), lambda: generate_dataset(start_date, end_date, seed=seed))
+
 @app.route("/api/synthetic_sales", methods=["GET"])
 def synthetic_sales():
     """API endpoint to generate synthetic sales data."""
@@ -337,17 +441,48 @@ def synthetic_sales():
         start_date_str = request.args.get('start_date', '2024-01-01')
         end_date_str = request.args.get('end_date', '2024-12-31')
     
+        stream = request.args.get('stream', 'false').lower() == 'true'
+        try:
+            seed = seed_from_request(request.args.get('seed'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        output_format = request.args.get('format', 'csv').lower()
+        if output_format not in OUTPUT_FILES:
+            return jsonify({"error": f"Unsupported format: {output_format}"}), 400
+        if stream and output_format != "csv":
+            return jsonify({"error": "Streaming is only available for csv"}), 400
+    
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-        df = generate_dataset(start_date, end_date)
-        csv_filename = "synthetic_pharma_sales.csv"
-        df.to_csv(csv_filename, index=False)
+        if stream:
+            # Send month-sized CSV chunks as they are generated, without touching the shared file
+            return Response(
+                stream_with_context(stream_csv(iter_dataset_chunks(start_date, end_date, seed))),
+                mimetype="text/csv",
+                headers={"Content-Disposition": f"attachment; filename=synthetic_pharma_sales_{start_date_str}_{end_date_str}.csv"}
+            )
+        if output_format == "partitioned":
+            # Written month by month, so memory stays bounded for any range
+            manifest = write_partitioned(iter_dataset_chunks(start_date, end_date, seed), OUTPUT_FILES["partitioned"])
+            return jsonify({
+                "message": "Dataset generated successfully!",
+                "row_count": manifest["row_count"],
+                "partition_count": len(manifest["partitions"]),
+                "start_date": start_date_str,
+                "end_date": end_date_str,
+                "seed": seed,
+                "file_saved": OUTPUT_FILES["partitioned"]
+            })
+        df = cached_generate_dataset(start_date, end_date, seed)
+        # Encoded once per dataset; a repeated request only relinks the shared file
+        file_name = save_cached_dataset(DATASET_CACHE, dataset_key(start_date, end_date, seed), df, output_format)
         return jsonify({
             "message": "Dataset generated successfully!",
             "row_count": len(df),
             "start_date": start_date_str,
             "end_date": end_date_str,
-            "file_saved": csv_filename
+            "seed": seed,
+            "file_saved": file_name
         })
     except Exception as e:
         logger.error(f"Error generating synthetic sales: {str(e)}")
@@ -355,13 +490,17 @@ def synthetic_sales():
 
 @app.route("/api/download_csv", methods=["GET"])
 def download_csv():
-    """API endpoint to download the generated CSV file."""
+    """API endpoint to download the generated file (csv by default, or ?format=parquet)."""
     try:
-        file_path = "synthetic_pharma_sales.csv"
+        file_path = OUTPUT_FILES.get(request.args.get('format', 'csv').lower())
+        if file_path is None:
+            return jsonify({"error": "Unsupported format"}), 400
+        if file_path == OUTPUT_FILES["partitioned"]:
+            return download_partitions(file_path, request.args)
         if os.path.exists(file_path):
             return send_file(file_path, as_attachment=True)
         else:
-            logger.error("CSV file not found")
+            logger.error(f"{file_path} not found")
             return jsonify({"error": "File not found!"}), 404
     except Exception as e:
         logger.error(f"Error downloading CSV: {str(e)}")
@@ -374,7 +513,7 @@ def generate_sample():
         sample_start = datetime(2024, 1, 1)
         sample_end = datetime(2024, 1, 7)
         
-        df = generate_dataset(sample_start, sample_end)
+        df = cached_generate_dataset(sample_start, sample_end)
         
         return jsonify({
             "message": "Sample dataset generated successfully!",
@@ -386,5 +525,10 @@ def generate_sample():
         logger.error(f"Error generating sample: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/cache_stats", methods=["GET"])
+def cache_stats():
+    """Hit/miss counters and size of the dataset cache."""
+    return jsonify(DATASET_CACHE.stats())
+
 if __name__ == "__main__":
     app.run(host='0.0.0.0', debug=True, port=5001)
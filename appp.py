@@ -1,11 +1,17 @@
-from flask import Flask, jsonify, send_file, request
+from flask import Flask, Response, jsonify, send_file, request, stream_with_context
 import pandas as pd
 import numpy as np
-import random
 from datetime import datetime, timedelta
 import os
 import logging
-from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from calendar_features import (HOLIDAY_WINDOW_DAYS, RECURRING_HOLIDAYS, OutbreakIndex, build_calendar,
+                               days_to_holiday, load_outbreaks, month_windows)
+from dataset_cache import DatasetCache, config_fingerprint
+from partitioned_dataset import OUTPUT_FILES, save_cached_dataset, stream_csv, write_partitioned
+from web_helpers import download_partitions
+from seeding import (MASTER_SEED, DRUG_DATABASE_STREAM, DAILY_STREAM, TREND_STREAM, daily_uniforms,
+                     label_column, scaled_integers, seed_from_request, stream_rng)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -57,23 +63,24 @@ ATC_CATEGORIES = {
     }
 }
 
-# Create a drug database with more realistic attributes
-DRUG_DATABASE = {}
-for atc_code, data in ATC_CATEGORIES.items():
-    for drug in data["examples"]:
-        base_price = round(np.random.uniform(2.5, 50.0), 2)
-        effectiveness = np.random.randint(3, 6)
-        time_on_market = np.random.randint(6, 120)
-        
-        DRUG_DATABASE[drug] = {
+def build_drug_database(seed=MASTER_SEED):
+    """Create a drug database with more realistic attributes, drawing each drug from its own stream."""
+    database = {}
+    drugs = [(atc_code, drug) for atc_code, data in ATC_CATEGORIES.items() for drug in data["examples"]]
+    for i, (atc_code, drug) in enumerate(drugs):
+        rng = stream_rng(seed, DRUG_DATABASE_STREAM, i)
+        database[drug] = {
             "atc_code": atc_code,
-            "base_price": base_price,
-            "effectiveness": effectiveness,
-            "time_on_market": time_on_market,
-            "base_demand": np.random.randint(100, 1000),
-            "typical_prescription_duration": np.random.randint(3, 30),  # Days
-            "shelf_life": np.random.randint(12, 36)  # Months
+            "base_price": round(float(rng.uniform(2.5, 50.0)), 2),
+            "effectiveness": int(rng.integers(3, 6)),
+            "time_on_market": int(rng.integers(6, 120)),
+            "base_demand": int(rng.integers(100, 1000)),
+            "typical_prescription_duration": int(rng.integers(3, 30)),  # Days
+            "shelf_life": int(rng.integers(12, 36))  # Months
         }
+    return database
+
+DRUG_DATABASE = build_drug_database(MASTER_SEED)
 
 # Rwanda provinces and healthcare centers
 RWANDA_PROVINCES = ["Kigali", "Northern", "Eastern", "Southern", "Western"]
@@ -169,35 +176,13 @@ DEMOGRAPHIC_DATA = {
     }
 }
 
-# Rwanda holidays for realism
-RWANDA_HOLIDAYS = [
-    datetime(2024, 1, 1),   # New Year's Day
-    datetime(2024, 1, 2),   # Day after New Year
-    datetime(2024, 2, 1),   # Heroes' Day
-    datetime(2024, 4, 7),   # Genocide Memorial Day (week-long impact)
-    datetime(2024, 4, 8),
-    datetime(2024, 4, 9),
-    datetime(2024, 4, 10),
-    datetime(2024, 4, 11),
-    datetime(2024, 4, 12),
-    datetime(2024, 4, 13),
-    datetime(2024, 5, 1),   # Labor Day
-    datetime(2024, 7, 1),   # Independence Day
-    datetime(2024, 7, 4),   # Liberation Day
-    datetime(2024, 8, 15),  # Assumption Day
-    datetime(2024, 12, 25), # Christmas Day
-    datetime(2024, 12, 26)  # Boxing Day
-]
-
-# Rwanda-specific disease outbreaks (hypothetical)
-DISEASE_OUTBREAKS = [
-    {"start_date": datetime(2024, 3, 15), "end_date": datetime(2024, 4, 30), 
-     "disease": "Respiratory Infection", "affected_atc": ["R03", "R06", "N02BE/B"], "intensity": 1.8},
-    {"start_date": datetime(2024, 9, 1), "end_date": datetime(2024, 10, 15), 
-     "disease": "Malaria Surge", "affected_atc": ["N02BE/B"], "intensity": 1.6},
-    {"start_date": datetime(2024, 11, 10), "end_date": datetime(2024, 12, 20), 
-     "disease": "Gastrointestinal Outbreak", "affected_atc": ["N02BA", "N02BE/B"], "intensity": 1.5}
-]
+# Rwanda-specific disease outbreaks (hypothetical), indexed by ATC code for fast date lookups.
+# Holidays recur every year and come from calendar_features.RECURRING_HOLIDAYS.
+DISEASE_OUTBREAKS_CONFIG = os.environ.get(
+    "DISEASE_OUTBREAKS_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "disease_outbreaks.json")
+)
+DISEASE_OUTBREAKS = load_outbreaks(DISEASE_OUTBREAKS_CONFIG)
+OUTBREAK_INDEX = OutbreakIndex(DISEASE_OUTBREAKS)
 
 def get_rwanda_season(month):
     """Return Rwanda's season for the given month."""
@@ -210,35 +195,71 @@ def get_rwanda_season(month):
     else:
         return "Urugaryi"    # Short dry (Dec–Feb)
 
-@lru_cache(maxsize=366)
 def is_holiday_or_near(date):
     """Check if date is a holiday or within 3 days of one."""
-    holiday_proximity = min((abs((date - h).days) for h in RWANDA_HOLIDAYS), default=100)
-    if holiday_proximity <= 3:
+    holiday_proximity = days_to_holiday(date)
+    if holiday_proximity <= HOLIDAY_WINDOW_DAYS:
         return 1
     return 0
 
 def is_during_outbreak(date, atc_code):
     """Return outbreak intensity factor if date falls during an outbreak affecting the ATC code."""
-    for outbreak in DISEASE_OUTBREAKS:
-        if (outbreak["start_date"] <= date <= outbreak["end_date"] and 
-                atc_code in outbreak["affected_atc"]):
-            return outbreak["intensity"]
-    return 1.0
+    return OUTBREAK_INDEX.intensity_on(atc_code, date)
 
-def generate_supply_chain_delay(province, date):
-    """Generate more realistic supply chain delays based on location and season."""
-    base_weights = {
-        "Kigali": [0.7, 0.2, 0.08, 0.02],
-        "Northern": [0.5, 0.3, 0.15, 0.05],
-        "Eastern": [0.5, 0.25, 0.15, 0.1],
-        "Southern": [0.5, 0.25, 0.15, 0.1],
-        "Western": [0.4, 0.3, 0.2, 0.1]
-    }
-    
-    # Adjust weights for rainy seasons
-    season = get_rwanda_season(date.month)
-    weights = base_weights[province].copy()
+# Supply chain delay categories and per-province weights (None, Low, Medium, High)
+SUPPLY_CHAIN_DELAY_LEVELS = ["None", "Low", "Medium", "High"]
+SUPPLY_CHAIN_DELAY_WEIGHTS = {
+    "Kigali": [0.7, 0.2, 0.08, 0.02],
+    "Northern": [0.5, 0.3, 0.15, 0.05],
+    "Eastern": [0.5, 0.25, 0.15, 0.1],
+    "Southern": [0.5, 0.25, 0.15, 0.1],
+    "Western": [0.4, 0.3, 0.2, 0.1]
+}
+
+# Geographic price factor per province
+GEO_PRICE_FACTOR = {
+    "Kigali": 1.1,       # Higher prices in capital
+    "Northern": 0.95,
+    "Eastern": 0.9,
+    "Southern": 0.92,
+    "Western": 0.93
+}
+
+# Income-adjusted price elasticity
+INCOME_ELASTICITY_FACTOR = {
+    "higher": 0.3,     # Wealthy areas less sensitive to price
+    "medium": 0.4,
+    "medium-low": 0.45,
+    "lower": 0.5       # Poorer areas more sensitive to price
+}
+
+# Promotion probability based on income level
+PROMOTION_PROBABILITY = {
+    "higher": 0.4,     # More marketing in wealthy areas
+    "medium": 0.3,
+    "medium-low": 0.25,
+    "lower": 0.2       # Less marketing in poorer areas
+}
+
+# Supply chain effect on units sold, and availability score range, per delay category
+AVAILABILITY_FACTOR = {"None": 1.0, "Low": 0.9, "Medium": 0.75, "High": 0.5}
+AVAILABILITY_SCORE_RANGE = {
+    "None": (0.9, 1.0),
+    "Low": (0.7, 0.9),
+    "Medium": (0.5, 0.7),
+    "High": (0.3, 0.5)
+}
+
+# Stock buffer range (inclusive) per center type
+STOCK_BUFFER_RANGE = {
+    "referral_hospital": (100, 300),
+    "district_hospital": (50, 150),
+    "health_center": (10, 100)
+}
+
+def get_supply_chain_weights(province, season):
+    """Return the delay category weights for a province in the given season."""
+    weights = list(SUPPLY_CHAIN_DELAY_WEIGHTS[province])
     
     if season in ["Itumba", "Umuhindo"]:  # Rainy seasons
         # Shift weight from "None" to higher delay categories
@@ -247,33 +268,72 @@ def generate_supply_chain_delay(province, date):
         weights[1] += shift * 0.4
         weights[2] += shift * 0.4
         weights[3] += shift * 0.2
-    
-    return random.choices(["None", "Low", "Medium", "High"], weights=weights)[0]
+    return weights
+
+def generate_supply_chain_delay(province, date, rng):
+    """Generate more realistic supply chain delays based on location and season."""
+    # Adjust weights for rainy seasons
+    weights = np.array(get_supply_chain_weights(province, get_rwanda_season(date.month)))
+    return SUPPLY_CHAIN_DELAY_LEVELS[rng.choice(len(weights), p=weights / weights.sum())]
 
-def generate_drug_price(drug_name, date, province):
+def generate_drug_price(drug_name, date, province, rng):
     """Generate price variations based on multiple factors."""
     base_price = DRUG_DATABASE[drug_name]["base_price"]
     
     # Geographic factor
-    geo_factor = {
-        "Kigali": 1.1,       # Higher prices in capital
-        "Northern": 0.95,
-        "Eastern": 0.9,
-        "Southern": 0.92,
-        "Western": 0.93
-    }[province]
+    geo_factor = GEO_PRICE_FACTOR[province]
     
     # Time-based factor (subtle price increases over time)
     days_since_start = (date - datetime(2024, 1, 1)).days
     time_factor = 1 + (days_since_start / 365 * 0.05)  # Up to 5% increase over the year
     
     # Random fluctuation
-    random_factor = random.uniform(0.97, 1.03)
+    random_factor = rng.uniform(0.97, 1.03)
     
     return round(base_price * geo_factor * time_factor * random_factor, 2)
 
+def get_center_type(health_center):
+    """Classify a health center as referral hospital, district hospital or health center."""
+    if "Hospital" in health_center:
+        if any(premium in health_center for premium in ["CHUK", "King Faisal", "CHUB", "Rwanda Military Hospital"]):
+            return "referral_hospital"
+        return "district_hospital"
+    return "health_center"
+
+def get_center_size_factor(health_center):
+    """Center size factor (bigger hospitals use more)."""
+    if "Hospital" in health_center:
+        if any(premium in health_center for premium in ["CHUK", "King Faisal", "CHUB"]):
+            return 1.5
+        return 1.2
+    return 1.0
+
+def adjust_base_demand(base_demand, atc_code, center_type, age_distribution):
+    """Adjust a drug's base demand by center type and province age distribution."""
+    # Referral hospitals see more rare/complex cases
+    if center_type == "referral_hospital":
+        if atc_code in ["N05B", "N05C", "R03"]:  # More specialized medications
+            base_demand *= 1.3
+    elif center_type == "health_center":
+        if atc_code in ["N02BA", "N02BE/B", "M01AE"]:  # Common medications
+            base_demand *= 1.2
+        else:
+            base_demand *= 0.7  # Less specialized meds at health centers
+    
+    # Age distribution impacts on certain medications
+    # More children -> more pediatric medications
+    if age_distribution["0-14"] > 0.38:  # Higher than average children
+        if atc_code in ["N02BE/B", "R06"]:  # Pediatric-common meds
+            base_demand *= 1.15
+    
+    # More elderly -> more chronic disease medications
+    if age_distribution["65+"] > 0.035:  # Higher than average elderly
+        if atc_code in ["M01AB", "M01AE", "N05C"]:  # Elderly-common meds
+            base_demand *= 1.1
+    return base_demand
+
 def calculate_units_sold(base_demand, date, atc_code, drug_name, price, 
-                         province, health_center, supply_delay, promotion):
+                         province, health_center, supply_delay, promotion, rng):
     """Calculate units sold with multiple realistic factors."""
     # Get the seasonal factor for this drug category
     season = get_rwanda_season(date.month)
@@ -304,12 +364,7 @@ def calculate_units_sold(base_demand, date, atc_code, drug_name, price,
     price_ratio = price / avg_price
     
     # Income-adjusted price elasticity
-    income_elasticity_factor = {
-        "higher": 0.3,     # Wealthy areas less sensitive to price
-        "medium": 0.4,
-        "medium-low": 0.45,
-        "lower": 0.5       # Poorer areas more sensitive to price
-    }[DEMOGRAPHIC_DATA[province]["income_level"]]
+    income_elasticity_factor = INCOME_ELASTICITY_FACTOR[DEMOGRAPHIC_DATA[province]["income_level"]]
     
     if price_ratio > 1:
         units *= (1 - (price_ratio - 1) * income_elasticity_factor)
@@ -321,31 +376,23 @@ def calculate_units_sold(base_demand, date, atc_code, drug_name, price,
         units *= 1.2
     
     # Supply chain effect
-    availability_factor = {
-        "None": 1.0,
-        "Low": 0.9,
-        "Medium": 0.75,
-        "High": 0.5
-    }[supply_delay]
+    availability_factor = AVAILABILITY_FACTOR[supply_delay]
     units *= availability_factor
     
     # Center size factor (bigger hospitals use more)
-    center_size_factor = 1.0
-    if "Hospital" in health_center:
-        if any(premium in health_center for premium in ["CHUK", "King Faisal", "CHUB"]):
-            center_size_factor = 1.5
-        else:
-            center_size_factor = 1.2
-    units *= center_size_factor
+    units *= get_center_size_factor(health_center)
 
-    units *= random.uniform(0.9, 1.1)
+    units *= rng.uniform(0.9, 1.1)
     
     return max(int(units), 0) 
 
-def generate_dataset(start_date, end_date, include_trends=True, increase_noise=False, shuffle_target=False):
+def generate_dataset_rows(start_date, end_date, include_trends=True, increase_noise=False, shuffle_target=False,
+                          seed=MASTER_SEED):
+    """Generate the multi-province dataset one row at a time from a single stream (reference implementation)."""
     logger.info(f"Generating data from {start_date} to {end_date}")
     rows = []
     date_range = pd.date_range(start_date, end_date)
+    rng = np.random.default_rng(seed)
     
     # Generate data for each province and health center
     for province in RWANDA_PROVINCES:
@@ -359,13 +406,7 @@ def generate_dataset(start_date, end_date, include_trends=True, increase_noise=F
             logger.info(f"Generating data for {health_center} in {province} province")
             
             # Determine health center type
-            if "Hospital" in health_center:
-                if any(premium in health_center for premium in ["CHUK", "King Faisal", "CHUB", "Rwanda Military Hospital"]):
-                    center_type = "referral_hospital"
-                else:
-                    center_type = "district_hospital"
-            else:
-                center_type = "health_center"
+            center_type = get_center_type(health_center)
             
             # For each drug
             for drug_name, drug_data in DRUG_DATABASE.items():
@@ -373,31 +414,12 @@ def generate_dataset(start_date, end_date, include_trends=True, increase_noise=F
                 base_demand = drug_data["base_demand"]
                 
                 # Adjust base demand by demographics and center type
-                # Referral hospitals see more rare/complex cases
-                if center_type == "referral_hospital":
-                    if atc_code in ["N05B", "N05C", "R03"]:  # More specialized medications
-                        base_demand *= 1.3
-                elif center_type == "health_center":
-                    if atc_code in ["N02BA", "N02BE/B", "M01AE"]:  # Common medications
-                        base_demand *= 1.2
-                    else:
-                        base_demand *= 0.7  # Less specialized meds at health centers
-                
-                # Age distribution impacts on certain medications
-                # More children -> more pediatric medications
-                if age_distribution["0-14"] > 0.38:  # Higher than average children
-                    if atc_code in ["N02BE/B", "R06"]:  # Pediatric-common meds
-                        base_demand *= 1.15
-                
-                # More elderly -> more chronic disease medications
-                if age_distribution["65+"] > 0.035:  # Higher than average elderly
-                    if atc_code in ["M01AB", "M01AE", "N05C"]:  # Elderly-common meds
-                        base_demand *= 1.1
+                base_demand = adjust_base_demand(base_demand, atc_code, center_type, age_distribution)
                 
                 # Create artificial trends if requested
                 if include_trends:
                     # Create some drugs with increasing or decreasing trends
-                    trend_factor = random.choice([0.95, 0.98, 1.0, 1.0, 1.0, 1.02, 1.05])
+                    trend_factor = rng.choice([0.95, 0.98, 1.0, 1.0, 1.0, 1.02, 1.05])
                     base_demand_with_trend = base_demand
                 
                 # For each date
@@ -411,46 +433,33 @@ def generate_dataset(start_date, end_date, include_trends=True, increase_noise=F
                         current_base_demand = base_demand
                     
                     # Generate variable factors
-                    supply_delay = generate_supply_chain_delay(province, date)
-                    price = generate_drug_price(drug_name, date, province)
+                    supply_delay = generate_supply_chain_delay(province, date, rng)
+                    price = generate_drug_price(drug_name, date, province, rng)
                     
                     # Promotion probability based on income level
-                    promotion_prob = {
-                        "higher": 0.4,     # More marketing in wealthy areas
-                        "medium": 0.3,
-                        "medium-low": 0.25,
-                        "lower": 0.2       # Less marketing in poorer areas
-                    }[income_level]
-                    promotion = np.random.choice([0, 1], p=[1-promotion_prob, promotion_prob])
+                    promotion_prob = PROMOTION_PROBABILITY[income_level]
+                    promotion = rng.choice([0, 1], p=[1-promotion_prob, promotion_prob])
                     
                     effectiveness = drug_data["effectiveness"]
                     time_on_market = drug_data["time_on_market"]
-                    competitors = np.random.randint(2, 8)
+                    competitors = rng.integers(2, 8)
                     
                     # Calculate availability score
-                    availability_score = round({
-                        "None": np.random.uniform(0.9, 1.0),
-                        "Low": np.random.uniform(0.7, 0.9),
-                        "Medium": np.random.uniform(0.5, 0.7),
-                        "High": np.random.uniform(0.3, 0.5)
-                    }[supply_delay], 2)
+                    availability_score = round(rng.uniform(*AVAILABILITY_SCORE_RANGE[supply_delay]), 2)
                     
                     # Calculate units sold
                     units_sold = calculate_units_sold(
                         current_base_demand, date, atc_code, drug_name, 
-                        price, province, health_center, supply_delay, promotion
+                        price, province, health_center, supply_delay, promotion, rng
                     )
                     
                     # Generate realistic timestamps
-                    stock_entry_timestamp = date - timedelta(days=random.randint(5, 30))
-                    expiration_date = date + timedelta(days=random.randint(30, drug_data["shelf_life"]*30))
+                    stock_entry_timestamp = date - timedelta(days=int(rng.integers(5, 31)))
+                    expiration_date = date + timedelta(days=int(rng.integers(30, drug_data["shelf_life"]*30 + 1)))
                     
                     # Available stock adjusted by center type and region
-                    base_stock_buffer = {
-                        "referral_hospital": random.randint(100, 300),
-                        "district_hospital": random.randint(50, 150),
-                        "health_center": random.randint(10, 100)
-                    }[center_type]
+                    low, high = STOCK_BUFFER_RANGE[center_type]
+                    base_stock_buffer = int(rng.integers(low, high + 1))
                     
                     # Remote areas keep more stock to account for supply chain issues
                     if population_density == "low":
@@ -459,8 +468,8 @@ def generate_dataset(start_date, end_date, include_trends=True, increase_noise=F
                     available_stock = units_sold + base_stock_buffer
                     
                     # Create sale timestamp at a realistic hour (7AM to 9PM)
-                    sale_hour = random.randint(7, 21)
-                    sale_timestamp = datetime.combine(date.date(), datetime.min.time()) + timedelta(hours=sale_hour, minutes=random.randint(0, 59))
+                    sale_hour = int(rng.integers(7, 22))
+                    sale_timestamp = datetime.combine(date.date(), datetime.min.time()) + timedelta(hours=sale_hour, minutes=int(rng.integers(0, 60)))
                     
                     rows.append({
                         "Drug_ID": drug_name,
@@ -491,6 +500,224 @@ def generate_dataset(start_date, end_date, include_trends=True, increase_noise=F
     logger.info(f"Generated {len(rows)} data points")
     return pd.DataFrame(rows)
 
+def center_streams():
+    """Stream path (province index, center index within province) of every health center, in generation order."""
+    return [(p, c) for p, province in enumerate(RWANDA_PROVINCES) for c in range(len(HEALTHCARE_CENTERS[province]))]
+
+def draw_trend_factors(seed, paths):
+    """Draw one demand trend factor per (center, drug) pair, each center from its own stream."""
+    return np.array([
+        stream_rng(seed, TREND_STREAM, p, c).choice([0.95, 0.98, 1.0, 1.0, 1.0, 1.02, 1.05], size=len(DRUG_DATABASE))
+        for p, c in paths
+    ]).reshape(-1, len(DRUG_DATABASE))
+
+def generate_dataset_batched(start_date, end_date, include_trends=True, increase_noise=False, shuffle_target=False,
+                             seed=MASTER_SEED, trend_origin=None, paths=None):
+    """Generate the multi-province dataset as arrays over a (center, drug, date) grid, for all centers or the given paths."""
+    logger.info(f"Generating batched data from {start_date} to {end_date}")
+    date_range = pd.date_range(start_date, end_date)
+
+    if paths is None:
+        paths = center_streams()
+    centers = [(RWANDA_PROVINCES[p], HEALTHCARE_CENTERS[RWANDA_PROVINCES[p]][c]) for p, c in paths]
+    drug_names = list(DRUG_DATABASE)
+    drugs = [DRUG_DATABASE[name] for name in drug_names]
+    n_centers, n_drugs, n_dates = len(centers), len(drugs), len(date_range)
+    shape = (n_centers, n_drugs, n_dates)
+
+    # Per-center attributes, shape (C,)
+    provinces = [province for province, _ in centers]
+    center_types = [get_center_type(health_center) for _, health_center in centers]
+    income_levels = [DEMOGRAPHIC_DATA[province]["income_level"] for province in provinces]
+    geo_factor = np.array([GEO_PRICE_FACTOR[province] for province in provinces])
+    elasticity = np.array([INCOME_ELASTICITY_FACTOR[level] for level in income_levels])
+    promotion_prob = np.array([PROMOTION_PROBABILITY[level] for level in income_levels])
+    center_size = np.array([get_center_size_factor(health_center) for _, health_center in centers])
+    low_density = np.array([DEMOGRAPHIC_DATA[province]["population_density"] == "low" for province in provinces])
+
+    # Per-drug attributes, shape (D,)
+    atc_codes = [d["atc_code"] for d in drugs]
+    base_price = np.array([d["base_price"] for d in drugs])
+    shelf_life_days = np.array([d["shelf_life"] * 30 for d in drugs], dtype=np.int64)
+
+    # Per-date attributes from the calendar table, shape (T,)
+    calendar = build_calendar(start_date, end_date, OUTBREAK_INDEX, sorted(set(atc_codes)))
+    seasons = calendar["Season"].to_numpy()
+    holiday = calendar["Holiday_Week"].to_numpy()
+    weekend = calendar["Is_Weekend"].to_numpy()
+    time_factor = 1 + ((date_range - datetime(2024, 1, 1)).days.to_numpy() / 365 * 0.05)
+    # Trends count from trend_origin, so month chunks of a longer range share one origin
+    days_passed = (date_range - pd.Timestamp(trend_origin if trend_origin is not None else start_date)).days.to_numpy()
+
+    # Per (center, drug) and (drug, date) tables
+    base_demand = np.array([
+        [adjust_base_demand(d["base_demand"], d["atc_code"], center_type, DEMOGRAPHIC_DATA[province]["age_distribution"]) for d in drugs]
+        for province, center_type in zip(provinces, center_types)
+    ], dtype=float).reshape(n_centers, n_drugs)
+    demographic = np.array([
+        [DEMOGRAPHIC_DATA[province]["disease_prevalence"][atc] for atc in atc_codes] for province in provinces
+    ]).reshape(n_centers, n_drugs)
+    seasonal = np.array([
+        [ATC_CATEGORIES[atc]["seasonal_factor"][season] for season in seasons] for atc in atc_codes
+    ]).reshape(n_drugs, n_dates)
+    outbreak = calendar[[f"Outbreak_{atc}" for atc in atc_codes]].to_numpy().T.reshape(n_drugs, n_dates)
+
+    # Uniform draws per center: delay, price, promotion, units noise, availability score,
+    # stock buffer, stock entry, expiration, sale hour, sale minute, competitors
+    u = np.stack([
+        daily_uniforms(seed, (DAILY_STREAM, p, c), 11, (n_drugs,), date_range) for p, c in paths
+    ], axis=1).reshape(11, *shape)
+
+    # Trend per (center, drug), applied as trend ** (days_passed / 30)
+    if include_trends:
+        trend = draw_trend_factors(seed, paths)
+        demand = base_demand[:, :, None] * trend[:, :, None] ** (days_passed[None, None, :] / 30)
+    else:
+        demand = np.broadcast_to(base_demand[:, :, None], shape)
+
+    # Supply chain delay: inverse-CDF sampling against per (province, season) cumulative weights
+    season_cum = {
+        (province, season): np.cumsum(get_supply_chain_weights(province, season))
+        for province in set(provinces) for season in set(seasons)
+    }
+    cum_weights = np.array([
+        [season_cum[province, season] for season in seasons] for province in provinces
+    ]).reshape(n_centers, n_dates, len(SUPPLY_CHAIN_DELAY_LEVELS))
+    delay_idx = (u[0][..., None] > cum_weights[:, None, :, :]).sum(axis=-1)
+    delay_idx = np.minimum(delay_idx, len(SUPPLY_CHAIN_DELAY_LEVELS) - 1)
+
+    price = np.round(
+        base_price[None, :, None] * geo_factor[:, None, None] * time_factor[None, None, :] * (0.97 + 0.06 * u[1]), 2
+    )
+    price_ratio = price / base_price[None, :, None]
+    center_elasticity = elasticity[:, None, None]
+    price_effect = np.where(
+        price_ratio > 1,
+        1 - (price_ratio - 1) * center_elasticity,
+        1 + (1 - price_ratio) * (center_elasticity * 0.6)
+    )
+    promotion = (u[2] < promotion_prob[:, None, None]).astype(np.int64)
+    availability = np.array([AVAILABILITY_FACTOR[level] for level in SUPPLY_CHAIN_DELAY_LEVELS])[delay_idx]
+
+    units = (
+        demand
+        * seasonal[None, :, :]
+        * outbreak[None, :, :]
+        * demographic[:, :, None]
+        * (1 + holiday * 0.15)[None, None, :]
+        * np.where(weekend, 0.7, 1.0)[None, None, :]
+        * price_effect
+        * np.where(promotion == 1, 1.2, 1.0)
+        * availability
+        * center_size[:, None, None]
+        * (0.9 + 0.2 * u[3])
+    )
+    units_sold = np.maximum(np.trunc(units), 0).astype(np.int64)
+
+    score_range = np.array([AVAILABILITY_SCORE_RANGE[level] for level in SUPPLY_CHAIN_DELAY_LEVELS])
+    score_low, score_high = score_range[delay_idx, 0], score_range[delay_idx, 1]
+    availability_score = np.round(score_low + (score_high - score_low) * u[4], 2)
+
+    buffer_range = np.array([STOCK_BUFFER_RANGE[center_type] for center_type in center_types]).reshape(n_centers, 2)
+    stock_buffer = scaled_integers(u[5], buffer_range[:, 0, None, None], buffer_range[:, 1, None, None] + 1)
+    stock_buffer = np.where(low_density[:, None, None], (stock_buffer * 1.3).astype(np.int64), stock_buffer)
+
+    # Flatten to the row order of the row-by-row generator: center -> drug -> date
+    n = units_sold.size
+    center_idx = np.repeat(np.arange(n_centers), n_drugs * n_dates)
+    drug_idx = np.tile(np.repeat(np.arange(n_drugs), n_dates), n_centers)
+    date_idx = np.tile(np.arange(n_dates), n_centers * n_drugs)
+    dates = date_range.values[date_idx]
+
+    u = u.reshape(11, n)
+    stock_entry_timestamp = dates - scaled_integers(u[6], 5, 31).astype("timedelta64[D]")
+    expiration_date = dates + scaled_integers(u[7], 30, shelf_life_days[drug_idx] + 1).astype("timedelta64[D]")
+    sale_minutes = scaled_integers(u[8], 7, 22) * 60 + scaled_integers(u[9], 0, 60)
+
+    df = pd.DataFrame({
+        "Drug_ID": label_column(drug_names, drug_idx),
+        "ATC_Code": label_column(atc_codes, drug_idx),
+        "Date": dates,
+        "Province": label_column(provinces, center_idx),
+        "Population_Density": label_column([DEMOGRAPHIC_DATA[p]["population_density"] for p in provinces], center_idx),
+        "Income_Level": label_column(income_levels, center_idx),
+        "Health_Center": label_column([health_center for _, health_center in centers], center_idx),
+        "Center_Type": label_column(center_types, center_idx),
+        "units_sold": units_sold.ravel(),
+        "Price_Per_Unit": price.ravel(),
+        "Availability_Score": availability_score.ravel(),
+        "Supply_Chain_Delay": label_column(SUPPLY_CHAIN_DELAY_LEVELS, delay_idx.ravel()),
+        "Season": label_column(seasons, date_idx),
+        "Effectiveness_Rating": np.array([d["effectiveness"] for d in drugs], dtype=np.int64)[drug_idx],
+        "Promotion": promotion.ravel(),
+        "Holiday_Week": holiday[date_idx],
+        "Disease_Outbreak": np.round(np.broadcast_to(outbreak[None, :, :], shape).ravel(), 2),
+        "Competitor_Count": scaled_integers(u[10], 2, 8),
+        "Time_On_Market": np.array([d["time_on_market"] for d in drugs], dtype=np.int64)[drug_idx],
+        "sale_timestamp": dates + sale_minutes.astype("timedelta64[m]"),
+        "stock_entry_timestamp": stock_entry_timestamp,
+        "expiration_date": expiration_date,
+        "available_stock": units_sold.ravel() + stock_buffer.ravel()
+    })
+    logger.info(f"Generated {len(df)} data points (batched)")
+    return df
+
+def generate_center_shard(start_date, end_date, include_trends, seed, path):
+    """Generate the rows of one health center; runs in a worker process."""
+    return generate_dataset_batched(start_date, end_date, include_trends, seed=seed, paths=[path])
+
+def generate_dataset_parallel(start_date, end_date, include_trends=True, increase_noise=False, shuffle_target=False,
+                              seed=MASTER_SEED, max_workers=None):
+    """Generate the multi-province dataset with one process-pool task per health center."""
+    paths = center_streams()
+    logger.info(f"Generating data for {len(paths)} centers in parallel from {start_date} to {end_date}")
+    n = len(paths)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        frames = list(pool.map(generate_center_shard, [start_date] * n, [end_date] * n,
+                               [include_trends] * n, [seed] * n, paths))
+    return pd.concat(frames, ignore_index=True)
+
+def generate_dataset(start_date, end_date, include_trends=True, increase_noise=False, shuffle_target=False,
+                     engine="batched", seed=MASTER_SEED):
+    """Generate the multi-province dataset with the "batched" (default), "parallel" or "rows" engine."""
+    if engine == "rows":
+        return generate_dataset_rows(start_date, end_date, include_trends, increase_noise, shuffle_target, seed)
+    if engine == "batched":
+        return generate_dataset_batched(start_date, end_date, include_trends, increase_noise, shuffle_target, seed)
+    if engine == "parallel":
+        return generate_dataset_parallel(start_date, end_date, include_trends, increase_noise, shuffle_target, seed)
+    raise ValueError(f"Unknown engine: {engine}")
+
+def iter_dataset_chunks(start_date, end_date, include_trends=True, seed=MASTER_SEED):
+    """Yield the multi-province dataset one calendar month at a time; rows match one call, ordered month by month."""
+    for chunk_start, chunk_end in month_windows(start_date, end_date):
+        yield generate_dataset_batched(chunk_start, chunk_end, include_trends,
+                                       seed=seed, trend_origin=start_date)
+
+# Two-tier (memory + disk) cache of generated datasets
+DATASET_CACHE = DatasetCache(cache_dir=os.environ.get("DATASET_CACHE_DIR", "dataset_cache"))
+
+# Bump whenever a code change alters the generated data, so cached datasets of older code are not served
+GENERATOR_VERSION = 1
+
+# Every configuration table that shapes the output; module constants, so hashed once rather than per request
+CONFIG_HASH = config_fingerprint(
+    ATC_CATEGORIES, DRUG_DATABASE, RWANDA_PROVINCES, HEALTHCARE_CENTERS, DEMOGRAPHIC_DATA, RECURRING_HOLIDAYS,
+    HOLIDAY_WINDOW_DAYS, DISEASE_OUTBREAKS, SUPPLY_CHAIN_DELAY_LEVELS, SUPPLY_CHAIN_DELAY_WEIGHTS, GEO_PRICE_FACTOR,
+    INCOME_ELASTICITY_FACTOR, PROMOTION_PROBABILITY, AVAILABILITY_FACTOR, AVAILABILITY_SCORE_RANGE, STOCK_BUFFER_RANGE
+)
+
+def dataset_key(start_date, end_date, include_trends=True, seed=MASTER_SEED, engine="batched"):
+    # The parallel engine produces exactly the batched output, so both share cache entries
+    key_engine = "batched" if engine == "parallel" else engine
+    return DATASET_CACHE.key("appp.multi_province", CONFIG_HASH, generator_version=GENERATOR_VERSION, start_date=start_date,
+                             end_date=end_date, include_trends=include_trends, engine=key_engine, seed=seed)
+
+def cached_generate_dataset(start_date, end_date, include_trends=True, seed=MASTER_SEED, engine="batched"):
+    """generate_dataset behind DATASET_CACHE, keyed on the parameters and the generator configuration."""
+    key = dataset_key(start_date, end_date, include_trends, seed, engine)
+    return DATASET_CACHE.get_or_generate(key, lambda: generate_dataset(start_date, end_date, include_trends, engine=engine, seed=seed))
+
 @app.route("/api/synthetic_sales", methods=["GET"])
 def synthetic_sales():
     """API endpoint to generate synthetic sales data."""
@@ -499,24 +726,58 @@ def synthetic_sales():
         start_date_str = request.args.get('start_date', '2024-01-01')
         end_date_str = request.args.get('end_date', '2024-12-31')
         include_trends = request.args.get('include_trends', 'true').lower() == 'true'
+        stream = request.args.get('stream', 'false').lower() == 'true'
+        try:
+            seed = seed_from_request(request.args.get('seed'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        parallel = request.args.get('parallel', 'false').lower() == 'true'
+        output_format = request.args.get('format', 'csv').lower()
+        if output_format not in OUTPUT_FILES:
+            return jsonify({"error": f"Unsupported format: {output_format}"}), 400
+        if stream and output_format != "csv":
+            return jsonify({"error": "Streaming is only available for csv"}), 400
         
         # Parse dates
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
         
+        if stream:
+            # Send month-sized CSV chunks as they are generated, without touching the shared file
+            return Response(
+                stream_with_context(stream_csv(iter_dataset_chunks(start_date, end_date, include_trends, seed))),
+                mimetype="text/csv",
+                headers={"Content-Disposition": f"attachment; filename=synthetic_pharma_sales_{start_date_str}_{end_date_str}.csv"}
+            )
+        
+        if output_format == "partitioned":
+            # Written month by month, so memory stays bounded for any range
+            manifest = write_partitioned(iter_dataset_chunks(start_date, end_date, include_trends, seed), OUTPUT_FILES["partitioned"])
+            return jsonify({
+                "message": "Dataset generated successfully!",
+                "row_count": manifest["row_count"],
+                "partition_count": len(manifest["partitions"]),
+                "start_date": start_date_str,
+                "end_date": end_date_str,
+                "seed": seed,
+                "file_saved": OUTPUT_FILES["partitioned"]
+            })
+        
         # Generate data
-        df = generate_dataset(start_date, end_date, include_trends)
+        engine = "parallel" if parallel else "batched"
+        df = cached_generate_dataset(start_date, end_date, include_trends, seed, engine)
         
-        # Save to CSV
-        csv_filename = "synthetic_pharma_sales.csv"
-        df.to_csv(csv_filename, index=False)
+        # Save in the requested format, encoded once per dataset; a repeated request only relinks the shared file
+        key = dataset_key(start_date, end_date, include_trends, seed, engine)
+        file_name = save_cached_dataset(DATASET_CACHE, key, df, output_format)
         
         return jsonify({
             "message": "Dataset generated successfully!",
             "row_count": len(df),
             "start_date": start_date_str,
             "end_date": end_date_str,
-            "file_saved": csv_filename
+            "seed": seed,
+            "file_saved": file_name
         })
     
     except Exception as e:
@@ -525,13 +786,17 @@ def synthetic_sales():
 
 @app.route("/api/download_csv", methods=["GET"])
 def download_csv():
-    """API endpoint to download the generated CSV file."""
+    """API endpoint to download the generated file (csv by default, or ?format=parquet)."""
     try:
-        file_path = "synthetic_pharma_sales.csv"
+        file_path = OUTPUT_FILES.get(request.args.get('format', 'csv').lower())
+        if file_path is None:
+            return jsonify({"error": "Unsupported format"}), 400
+        if file_path == OUTPUT_FILES["partitioned"]:
+            return download_partitions(file_path, request.args)
         if os.path.exists(file_path):
             return send_file(file_path, as_attachment=True)
         else:
-            logger.error("CSV file not found")
+            logger.error(f"{file_path} not found")
             return jsonify({"error": "File not found!"}), 404
     except Exception as e:
         logger.error(f"Error downloading CSV: {str(e)}")
@@ -545,7 +810,7 @@ def generate_sample():
         sample_start = datetime(2024, 1, 1)
         sample_end = datetime(2024, 1, 7)
         
-        df = generate_dataset(sample_start, sample_end)
+        df = cached_generate_dataset(sample_start, sample_end)
         
         return jsonify({
             "message": "Sample dataset generated successfully!",
@@ -557,5 +822,10 @@ def generate_sample():
         logger.error(f"Error generating sample: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/cache_stats", methods=["GET"])
+def cache_stats():
+    """Hit/miss counters and size of the dataset cache."""
+    return jsonify(DATASET_CACHE.stats())
+
 if __name__ == "__main__":
     app.run(host='0.0.0.0',debug=True,port=5001)
@@ -0,0 +1,44 @@
+"""Compare the commodity table extraction paths of commodity_scraper on saved fixture HTML.
+
+Usage: python benchmarks/bench_commodity_extract.py [fixture.html]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import commodity_scraper  # noqa: E402
+
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "tradingeconomics_commodities.html")
+
+
+def bench(extract, html, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = extract(html)
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FIXTURE
+    with open(path, "rb") as f:
+        html = f.read()
+    print(f"Fixture {path} ({len(html):,} bytes)")
+
+    extractors = {
+        "html2text": commodity_scraper.extract_table_html2text,
+        "soupstrainer": commodity_scraper.extract_table_soup,
+    }
+    if commodity_scraper.lxml is not None:
+        extractors["soupstrainer+lxml"] = lambda h: commodity_scraper.extract_table_soup(h, parser="lxml")
+        extractors["lxml"] = commodity_scraper.extract_table_lxml
+
+    results = {name: bench(extract, html) for name, extract in extractors.items()}
+    reference, baseline = results["html2text"]
+    for name, (result, seconds) in results.items():
+        match = "same rows" if result == reference else "ROWS DIFFER"
+        print(f"{name:>17}: {len(result[1])} rows in {seconds * 1000:.1f}ms ({baseline / seconds:.1f}x, {match})")
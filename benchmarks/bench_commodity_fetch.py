@@ -0,0 +1,89 @@
+"""Fetch commodity pages from a local stub server: sequential requests.get vs CommodityFetcher.
+
+The stub serves the saved fixture HTML under /page-<n> with an artificial latency and an ETag,
+answers the first request for every page with a 503 so the fetcher's retry path is exercised,
+and answers a matching If-None-Match with a 304. A second fetcher pass shows the conditional path.
+
+Usage: python benchmarks/bench_commodity_fetch.py [pages] [latency_ms]
+"""
+import hashlib
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from commodity_fetcher import CommodityFetcher  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "tradingeconomics_commodities.html")
+
+
+def stub_server(body, latency, fail_first=True):
+    """Start a stub HTTP server on a free local port serving body; returns (server, base_url)."""
+    seen = set()
+    lock = threading.Lock()
+    etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            with lock:
+                first = self.path not in seen
+                seen.add(self.path)
+            if fail_first and first:
+                self.send_response(503)
+                self.end_headers()
+                return
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def fetch_sequential(urls):
+    bodies = {}
+    with requests.Session() as session:
+        for url in urls:
+            response = session.get(url, timeout=20)
+            if response.status_code == 503:  # Same single retry the stub requires
+                response = session.get(url, timeout=20)
+            bodies[url] = response.content
+    return bodies
+
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 200) / 1000
+    with open(FIXTURE, "rb") as f:
+        body = f.read()
+
+    fetcher = CommodityFetcher(per_host_limit=pages, backoff=0.05)
+    runs = [("sequential", fetch_sequential, True), ("async", fetcher.fetch_all, True), ("async 304", fetcher.fetch_all, False)]
+    for name, fetch, new_server in runs:
+        if new_server:  # Fresh stub so every page fails once again
+            server, base_url = stub_server(body, latency)
+            urls = [f"{base_url}/page-{i}" for i in range(pages)]
+        t0 = time.perf_counter()
+        results = fetch(urls)
+        seconds = time.perf_counter() - t0
+        fetcher.commit_validators()  # As after a successful store, so the next pass is conditional
+        ok = sum(getattr(result, "body", result) == body for result in results.values())
+        not_modified = sum(getattr(result, "modified", True) is False for result in results.values())
+        print(f"{name:>10}: {ok}/{pages} pages ({not_modified} not modified) in {seconds:.2f}s")
@@ -0,0 +1,36 @@
+"""Compare rows/sec of the row-by-row and columnar engines of app.generate_dataset.
+
+Usage: python benchmarks/bench_generate_dataset.py [years]
+"""
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app  # noqa: E402
+
+logging.getLogger(app.__name__).setLevel(logging.WARNING)
+
+
+def bench(engine, start_date, end_date, repeat=3):
+    best = float("inf")
+    rows = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        df = app.generate_dataset(start_date, end_date, engine=engine)
+        best = min(best, time.perf_counter() - t0)
+        rows = len(df)
+    return rows, best
+
+
+if __name__ == "__main__":
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    start_date = datetime(2024, 1, 1)
+    end_date = datetime(2024 + years - 1, 12, 31)
+    print(f"Range {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d}")
+    for engine in ["rows", "columnar"]:
+        rows, seconds = bench(engine, start_date, end_date)
+        print(f"{engine:>9}: {rows} rows in {seconds:.3f}s ({rows / seconds:,.0f} rows/sec)")
@@ -0,0 +1,52 @@
+"""Compare memory and time of loading a sales CSV with default dtypes vs the typed SALES_SCHEMA loader.
+
+Generates a multi-province dataset with appp.generate_dataset, writes it to a temporary CSV and
+reports the DataFrame size (deep memory usage) and the peak traced allocation of each loader.
+
+Usage: python benchmarks/bench_sales_loading.py [days]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import appp  # noqa: E402
+from models.demand_forecast import read_sales  # noqa: E402
+
+logging.getLogger(appp.__name__).setLevel(logging.WARNING)
+
+
+def default_loader(path):
+    return pd.read_csv(path, parse_dates=['Date'], keep_default_na=False, na_values=[''])
+
+
+def measure(load, path):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    df = load(path)
+    seconds = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, seconds, peak
+
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 90
+    start_date = datetime(2024, 1, 1)
+    df = appp.generate_dataset(start_date, start_date + timedelta(days=days - 1))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "sales.csv")
+        df.to_csv(path, index=False)
+        print(f"{len(df)} rows, {os.path.getsize(path) / 1e6:.1f} MB CSV")
+        for name, load in [("default", default_loader), ("typed", read_sales)]:
+            loaded, seconds, peak = measure(load, path)
+            size = loaded.memory_usage(deep=True).sum()
+            print(f"{name:>8}: {size / 1e6:7.1f} MB in memory, peak {peak / 1e6:7.1f} MB, "
+                  f"{len(loaded.columns)} columns, loaded in {seconds:.2f}s")
@@ -0,0 +1,188 @@
+import json
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Season name for each month (index 0 unused so months can index directly)
+SEASON_BY_MONTH = np.array([
+    "", "Urugaryi", "Urugaryi", "Itumba", "Itumba", "Itumba", "Icyi",
+    "Icyi", "Icyi", "Umuhindo", "Umuhindo", "Umuhindo", "Urugaryi"
+], dtype=object)
+
+# Rwanda public holidays recurring on the same day every year: (month, day, name)
+RECURRING_HOLIDAYS = [
+    (1, 1, "New Year's Day"),
+    (1, 2, "Day after New Year"),
+    (2, 1, "Heroes' Day"),
+    (4, 7, "Genocide Memorial Day"),  # Week-long impact
+    (4, 8, "Genocide Memorial Week"),
+    (4, 9, "Genocide Memorial Week"),
+    (4, 10, "Genocide Memorial Week"),
+    (4, 11, "Genocide Memorial Week"),
+    (4, 12, "Genocide Memorial Week"),
+    (4, 13, "Genocide Memorial Week"),
+    (5, 1, "Labor Day"),
+    (7, 1, "Independence Day"),
+    (7, 4, "Liberation Day"),
+    (8, 15, "Assumption Day"),
+    (12, 25, "Christmas Day"),
+    (12, 26, "Boxing Day")
+]
+
+# Days to the nearest holiday when there are no holidays at all
+NO_HOLIDAY_DISTANCE = 100
+
+# A date counts as a holiday week when it is this many days or fewer from a holiday
+HOLIDAY_WINDOW_DAYS = 3
+
+
+def to_days(dates):
+    """Convert dates (DatetimeIndex, datetimes or datetime64 values) to a datetime64[D] array."""
+    return np.asarray(pd.DatetimeIndex(dates).values, dtype="datetime64[D]")
+
+
+@lru_cache(maxsize=64)
+def rwanda_holidays(start_year, end_year):
+    """Sorted tuple of holiday datetimes for every year in [start_year, end_year]."""
+    return tuple(sorted(
+        datetime(year, month, day)
+        for year in range(start_year, end_year + 1)
+        for month, day, _ in RECURRING_HOLIDAYS
+    ))
+
+
+@lru_cache(maxsize=64)
+def holiday_ordinals(start_year, end_year):
+    """Day ordinals of rwanda_holidays(start_year, end_year), for scalar lookups without NumPy or pandas."""
+    return tuple(holiday.toordinal() for holiday in rwanda_holidays(start_year, end_year))
+
+
+def holidays_around(start_date, end_date):
+    """Holidays within the holiday window of any date in [start_date, end_date], including the neighbouring years."""
+    return rwanda_holidays(pd.Timestamp(start_date).year - 1, pd.Timestamp(end_date).year + 1)
+
+
+def month_windows(start_date, end_date):
+    """Split [start_date, end_date] into (chunk_start, chunk_end) pairs, one per calendar month."""
+    start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + pd.offsets.MonthEnd(0), end_date)
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end + pd.Timedelta(days=1)
+
+
+def load_outbreaks(path):
+    """Load the disease outbreak catalog from a JSON file, parsing its dates."""
+    with open(path) as f:
+        outbreaks = json.load(f)
+    for outbreak in outbreaks:
+        outbreak["start_date"] = datetime.strptime(outbreak["start_date"], "%Y-%m-%d")
+        outbreak["end_date"] = datetime.strptime(outbreak["end_date"], "%Y-%m-%d")
+    return outbreaks
+
+
+class OutbreakIndex:
+    """Disease outbreaks per ATC code, cut into disjoint date segments for binary-search lookups."""
+
+    def __init__(self, outbreaks):
+        self.outbreaks = list(outbreaks)
+        by_atc = {}
+        for position, outbreak in enumerate(self.outbreaks):
+            for atc_code in outbreak["affected_atc"]:
+                by_atc.setdefault(atc_code, []).append(position)
+        self.segments = {atc_code: self.build_segments(positions) for atc_code, positions in by_atc.items()}
+        # Segment starts as day ordinals with their intensities, for intensity_on
+        self.scalar_segments = {
+            atc_code: ([day.toordinal() for day in boundaries.astype(object)], intensity.tolist())
+            for atc_code, (boundaries, _, intensity, _) in self.segments.items()
+        }
+
+    def build_segments(self, positions):
+        positions = np.array(positions)
+        starts = to_days([self.outbreaks[p]["start_date"] for p in positions])
+        stops = to_days([self.outbreaks[p]["end_date"] for p in positions]) + 1
+        boundaries = np.unique(np.concatenate([starts, stops]))
+        # active[i, j]: outbreak positions[j] covers the segment starting at boundaries[i]
+        active = (starts[None, :] <= boundaries[:, None]) & (boundaries[:, None] < stops[None, :])
+        intensities = np.array([self.outbreaks[p]["intensity"] for p in positions], dtype=float)
+        first_active = active.argmax(axis=1)
+        intensity = np.where(active.any(axis=1), intensities[first_active], 1.0)
+        return boundaries, active, intensity, positions
+
+    def segment_index(self, atc_code, days):
+        boundaries = self.segments[atc_code][0]
+        return np.searchsorted(boundaries, days, side="right") - 1
+
+    def intensity(self, atc_code, dates):
+        """Outbreak intensity factor per date for one ATC code (1.0 outside outbreaks)."""
+        days = to_days(dates)
+        if atc_code not in self.segments:
+            return np.ones(len(days))
+        idx = self.segment_index(atc_code, days)
+        # Dates before the first boundary fall outside every outbreak
+        segment_intensity = np.append(self.segments[atc_code][2], 1.0)
+        return segment_intensity[idx]
+
+    def intensity_on(self, atc_code, date):
+        """intensity for a single date (datetime or Timestamp), by bisect over the segment starts."""
+        if atc_code not in self.scalar_segments:
+            return 1.0
+        ordinals, intensity = self.scalar_segments[atc_code]
+        idx = bisect_right(ordinals, date.toordinal()) - 1
+        return intensity[idx] if idx >= 0 else 1.0
+
+    def outbreaks_on(self, atc_code, date):
+        """Outbreaks affecting atc_code on date, in catalog order."""
+        if atc_code not in self.segments:
+            return []
+        idx = self.segment_index(atc_code, to_days([date]))[0]
+        if idx < 0:
+            return []
+        _, active, _, positions = self.segments[atc_code]
+        return [self.outbreaks[p] for p in positions[active[idx]]]
+
+
+def holiday_distance(dates, holidays):
+    """Days from each date to the nearest holiday, by binary search in the sorted holiday list."""
+    days = to_days(dates)
+    holiday_days = np.unique(to_days(holidays))
+    if len(holiday_days) == 0:
+        return np.full(len(days), NO_HOLIDAY_DISTANCE, dtype=np.int64)
+    idx = np.searchsorted(holiday_days, days)
+    after = holiday_days[np.minimum(idx, len(holiday_days) - 1)]
+    before = holiday_days[np.maximum(idx - 1, 0)]
+    distance = np.minimum(np.abs(after - days), np.abs(days - before))
+    return distance.astype(np.int64)
+
+
+def days_to_holiday(date):
+    """holiday_distance for a single date (datetime or Timestamp), by bisect over cached ordinals."""
+    ordinals = holiday_ordinals(date.year - 1, date.year + 1)
+    day = date.toordinal()
+    idx = bisect_left(ordinals, day)
+    return min(abs(day - holiday) for holiday in ordinals[max(idx - 1, 0):idx + 1])
+
+
+def build_calendar(start_date, end_date, outbreak_index=None, atc_codes=(), holidays=None):
+    """Date-indexed table of Season, Month, DayOfWeek, holiday and per-ATC outbreak features for [start_date, end_date]."""
+    dates = pd.date_range(start_date, end_date, name="Date")
+    if holidays is None:
+        holidays = holidays_around(start_date, end_date)
+    months = dates.month.to_numpy()
+    day_of_week = dates.dayofweek.to_numpy()
+    distance = holiday_distance(dates, holidays)
+    calendar = pd.DataFrame({
+        "Season": SEASON_BY_MONTH[months],
+        "Month": months,
+        "DayOfWeek": day_of_week,
+        "Is_Weekend": day_of_week >= 5,
+        "Holiday_Distance": distance,
+        "Holiday_Week": (distance <= HOLIDAY_WINDOW_DAYS).astype(np.int64)
+    }, index=dates)
+    for atc_code in atc_codes:
+        calendar[f"Outbreak_{atc_code}"] = outbreak_index.intensity(atc_code, dates) if outbreak_index is not None else 1.0
+    return calendar
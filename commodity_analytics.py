@@ -0,0 +1,36 @@
+import pandas as pd
+
+NUMERIC_COLUMNS = ['price', 'percentage', 'weekly', 'monthly', 'ytd', 'yoy']
+
+# Number of commodities listed as top gainers / losers
+TOP_N = 3
+
+
+def compute_analytics(records, top_n=TOP_N):
+    """Aggregates served by /api/analytics, computed once from serialized commodity rows."""
+    df = pd.DataFrame(records)
+    if df.empty:
+        return {}
+    # Values are parsed at ingestion; missing ones arrive as None
+    df[NUMERIC_COLUMNS] = df[NUMERIC_COLUMNS].astype('float64')
+
+    price = df['price']
+    movers = df[['agricultural', 'percentage']]
+    return {
+        "average_price": round(price.mean(), 2),
+        "min_price": {
+            "commodity": df.at[price.idxmin(), 'agricultural'],
+            "price": price.min()
+        },
+        "max_price": {
+            "commodity": df.at[price.idxmax(), 'agricultural'],
+            "price": price.max()
+        },
+        # Partial selection instead of sorting the whole table
+        "top_gainers": movers.nlargest(top_n, 'percentage').to_dict(orient='records'),
+        "top_losers": movers.nsmallest(top_n, 'percentage').to_dict(orient='records'),
+        "ytd": {
+            "positive": int((df['ytd'] > 0).sum()),
+            "negative": int((df['ytd'] < 0).sum())
+        }
+    }
@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from collections import namedtuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Browser-like headers; tradingeconomics rejects the default client user agent
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
+
+# Responses worth retrying: rate limiting and server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def load_sources(path):
+    """Load the commodity source list (name, url, table_index) from a JSON file."""
+    with open(path) as f:
+        return json.load(f)
+
+
+class FetchError(Exception):
+    pass
+
+
+# A fetched page; modified is False when the server answered 304 and body is the cached copy
+Page = namedtuple("Page", ["body", "modified"])
+
+
+def rows_digest(rows):
+    """Content hash of extracted table rows."""
+    return hashlib.sha256(json.dumps(rows).encode("utf-8")).hexdigest()
+
+
+class ChangeDetector:
+    """Digest of the last stored rows plus counters of how each refresh ended."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.digest = None
+        self.counters = {"refreshes": 0, "stored": 0, "skipped_not_modified": 0, "skipped_unchanged_rows": 0, "failed": 0}
+
+    def count(self, outcome):
+        with self.lock:
+            self.counters["refreshes"] += 1
+            self.counters[outcome] += 1
+
+    def changed(self, digest):
+        with self.lock:
+            return digest != self.digest
+
+    def stored(self, digest):
+        with self.lock:
+            self.digest = digest
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+class CommodityFetcher:
+    """Fetch several pages concurrently over one pooled aiohttp session.
+
+    Connections are reused across requests and capped per host. Each request has a timeout and
+    is retried with exponential backoff on connection errors, timeouts and RETRY_STATUSES.
+    Requests are conditional (If-None-Match / If-Modified-Since) when an earlier response carried
+    an ETag or Last-Modified; a 304 returns the body kept from that response. Validators of new
+    responses stay pending until commit_validators() is called, so a page whose data was never
+    stored is fetched in full again rather than answered with a 304.
+    """
+
+    def __init__(self, per_host_limit=2, total_limit=10, timeout=20, retries=3, backoff=0.5, headers=None):
+        self.per_host_limit = per_host_limit
+        self.total_limit = total_limit
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.headers = DEFAULT_HEADERS if headers is None else headers
+        self.validators = {}  # url -> (etag, last_modified, body), sent with requests
+        self.pending = {}  # Same, from responses of the last fetch not yet committed
+
+    def session(self):
+        connector = aiohttp.TCPConnector(limit=self.total_limit, limit_per_host=self.per_host_limit)
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+
+    def conditional_headers(self, url):
+        if url not in self.validators:
+            return {}
+        etag, last_modified, _ = self.validators[url]
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    async def fetch(self, session, url):
+        """Page of url, retrying transient failures; raises FetchError once retries are exhausted."""
+        self.pending.pop(url, None)
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.get(url, headers=self.conditional_headers(url)) as response:
+                    if response.status == 304 and url in self.validators:
+                        return Page(self.validators[url][2], False)
+                    if response.status == 200:
+                        body = await response.read()
+                        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+                        if etag or last_modified:
+                            self.pending[url] = (etag, last_modified, body)
+                        else:
+                            self.validators.pop(url, None)
+                        return Page(body, True)
+                    if response.status not in RETRY_STATUSES:
+                        raise FetchError(f"{url} returned HTTP {response.status}")
+                    error = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = repr(e)
+            if attempt == self.retries:
+                raise FetchError(f"{url} failed after {attempt + 1} attempts: {error}")
+            delay = self.backoff * 2 ** attempt
+            logger.warning(f"Fetching {url} failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def fetch_all_async(self, urls):
+        async with self.session() as session:
+            pages = await asyncio.gather(*(self.fetch(session, url) for url in urls), return_exceptions=True)
+        return dict(zip(urls, pages))
+
+    def commit_validators(self):
+        """Send the validators of the last fetch from now on; call once its pages are stored."""
+        self.validators.update(self.pending)
+        self.pending.clear()
+
+    def fetch_all(self, urls):
+        """{url: Page or the exception that ended its retries}, fetching all urls concurrently."""
+        return asyncio.run(self.fetch_all_async(list(dict.fromkeys(urls))))
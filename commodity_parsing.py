@@ -0,0 +1,47 @@
+from datetime import date
+
+import pandas as pd
+
+# Scraped table columns, in page order
+RAW_COLUMNS = ['agricultural', 'price', 'day', 'percentage', 'weekly', 'monthly', 'ytd', 'yoy', 'date']
+NUMERIC_COLUMNS = ['price', 'day', 'percentage', 'weekly', 'monthly', 'ytd', 'yoy']
+
+
+def parse_numbers(values):
+    """Strings like "1,035.85" or "-0.06%" to floats (percent columns keep their percent value); NaN if unparseable."""
+    cleaned = values.astype(str).str.replace(r"[%,\s]", "", regex=True)
+    return pd.to_numeric(cleaned, errors='coerce').astype('float64')
+
+
+def parse_quote_dates(values, today=None):
+    """Quote dates as shown on the page ("Apr/18", or "14:32" for quotes from today) to dates.
+
+    The page omits the year: a quote is never dated in the future, so a month/day later than
+    today belongs to last year.
+    """
+    today = pd.Timestamp(today or date.today()).normalize()
+    text = values.astype(str).str.strip()
+    this_year = pd.to_datetime(text + f"/{today.year}", format="%b/%d/%Y", errors='coerce')
+    last_year = pd.to_datetime(text + f"/{today.year - 1}", format="%b/%d/%Y", errors='coerce')
+    dates = this_year.where(this_year <= today + pd.Timedelta(days=1), last_year)
+    dates = dates.mask(text.str.fullmatch(r"\d{1,2}:\d{2}"), today)
+    return dates
+
+
+def parse_commodity_table(rows, today=None):
+    """Typed DataFrame from the scraped table rows (lists of cell strings in RAW_COLUMNS order)."""
+    df = pd.DataFrame(rows, columns=RAW_COLUMNS)
+    df['agricultural'] = df['agricultural'].astype(str).str.strip()
+    for col in NUMERIC_COLUMNS:
+        df[col] = parse_numbers(df[col])
+    df['date'] = parse_quote_dates(df['date'], today)
+    return df
+
+
+def commodity_records(df):
+    """Rows of a parsed table as dicts of Python values, with None for missing ones, ready for the database."""
+    records = df[RAW_COLUMNS].astype(object).where(df[RAW_COLUMNS].notna(), None).to_dict(orient='records')
+    for record in records:
+        if record['date'] is not None:
+            record['date'] = record['date'].date()
+    return records
@@ -0,0 +1,64 @@
+import html2text
+from bs4 import BeautifulSoup as bs, SoupStrainer
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional; extraction falls back to BeautifulSoup
+    lxml = None
+
+# Position of the agricultural commodities table on the tradingeconomics page
+COMMODITY_TABLE_INDEX = 2
+
+
+def cell_text(text):
+    """Cell text with runs of whitespace collapsed, as it reads on the page."""
+    return " ".join(text.split())
+
+
+def table_rows(headers, rows):
+    """Keep the rows that have a value for every header, trimmed to the header width."""
+    width = len(headers)
+    return headers, [row[:width] for row in rows if len(row) >= width]
+
+
+def extract_table_html2text(html, table_index=COMMODITY_TABLE_INDEX):
+    """Original extraction: parse the whole page and run every cell through html2text.
+
+    Kept as the reference for extract_table and the benchmark; it is much slower.
+    """
+    table = bs(html, 'html.parser').find_all('table')[table_index]
+    headers = [html2text.html2text(th.text).strip() for th in table.find('thead').find_all('th')]
+    rows = [
+        [html2text.html2text(td.text).strip() for td in tr.find_all('td')]
+        for tr in table.find('tbody').find_all('tr')
+    ]
+    return table_rows(headers, rows)
+
+
+def extract_table_soup(html, table_index=COMMODITY_TABLE_INDEX, parser='html.parser'):
+    """Build a BeautifulSoup tree of the page's tables only and read the cell text directly."""
+    table = bs(html, parser, parse_only=SoupStrainer('table')).find_all('table')[table_index]
+    headers = [cell_text(th.get_text(" ")) for th in table.find('thead').find_all('th')]
+    rows = [
+        [cell_text(td.get_text(" ")) for td in tr.find_all('td')]
+        for tr in table.find('tbody').find_all('tr')
+    ]
+    return table_rows(headers, rows)
+
+
+def extract_table_lxml(html, table_index=COMMODITY_TABLE_INDEX):
+    """Parse the page with lxml and read the target table's cell text directly."""
+    table = lxml.html.fromstring(html).xpath('//table')[table_index]
+    headers = [cell_text(th.text_content()) for th in table.xpath('./thead//th')]
+    rows = [
+        [cell_text(td.text_content()) for td in tr.xpath('./td')]
+        for tr in table.xpath('./tbody/tr')
+    ]
+    return table_rows(headers, rows)
+
+
+def extract_table(html, table_index=COMMODITY_TABLE_INDEX):
+    """(headers, rows) of cell strings of one table of the page, using lxml when it is installed."""
+    if lxml is not None:
+        return extract_table_lxml(html, table_index)
+    return extract_table_soup(html, table_index)
@@ -0,0 +1,38 @@
+import hashlib
+import json
+import threading
+from datetime import datetime
+
+
+class JsonSnapshot:
+    """Pre-serialized JSON payload that a background refresh swaps in whole.
+
+    Readers get the bytes, ETag and version of the last published payload without touching
+    the database or the upstream site. Publishing an identical payload keeps the version.
+    """
+
+    def __init__(self, payload=None):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.updated_at = None
+        self.body, self.etag = self.serialize([] if payload is None else payload)
+
+    def serialize(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        return body, hashlib.sha256(body).hexdigest()[:32]
+
+    def publish(self, payload):
+        """Replace the snapshot with payload. Returns True if the content changed."""
+        body, etag = self.serialize(payload)
+        with self.lock:
+            self.updated_at = datetime.now()
+            if etag == self.etag:
+                return False
+            self.body, self.etag = body, etag
+            self.version += 1
+            return True
+
+    def current(self):
+        """(body, etag, version) of the published snapshot."""
+        with self.lock:
+            return self.body, self.etag, self.version
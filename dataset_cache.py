@@ -0,0 +1,176 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def config_fingerprint(*tables):
+    """Hash the configuration tables that shape a generated dataset (drug database, ATC categories, ...)."""
+    payload = json.dumps(tables, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DatasetCache:
+    """Two-tier cache of generated DataFrames, keyed by a hash of everything that determines them.
+
+    The memory tier is an LRU of DataFrames, bounded by entry count and by their total
+    memory_usage(deep=True). The disk tier keeps one Parquet file per key, plus the encoded
+    output files of get_or_encode, and evicts the least recently used files once their total
+    size exceeds max_disk_bytes. Cached frames are shared between callers and must not be
+    modified in place.
+    """
+
+    def __init__(self, cache_dir="dataset_cache", max_memory_items=32, max_memory_bytes=512 * 1024 * 1024,
+                 max_disk_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()  # key -> (DataFrame, bytes)
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "encoded_hits": 0, "encoded_misses": 0,
+                         "memory_evictions": 0, "disk_evictions": 0}
+
+    def key(self, variant, config_hash, **params):
+        """Content address for a dataset: generator variant, config hash and call parameters."""
+        payload = json.dumps({"variant": variant, "config": config_hash, "params": params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def encoded_path(self, key, output_format):
+        return os.path.join(self.cache_dir, f"{key}.out.{output_format}")
+
+    def get_or_generate(self, key, generate):
+        """Return the cached DataFrame for key, calling generate() and storing the result on a miss."""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return self.memory[key][0]
+
+        df = self.read_disk(key)
+        if df is not None:
+            with self.lock:
+                self.counters["disk_hits"] += 1
+            self.remember(key, df)
+            return df
+
+        with self.lock:
+            self.counters["misses"] += 1
+        df = generate()
+        self.remember(key, df)
+        self.write_disk(key, df)
+        return df
+
+    def get_or_encode(self, key, output_format, encode):
+        """Path of key's dataset encoded as output_format, calling encode(path) only when it is not on disk yet."""
+        path = self.encoded_path(key, output_format)
+        try:
+            os.utime(path)  # Mark as recently used for eviction
+            with self.lock:
+                self.counters["encoded_hits"] += 1
+            return path
+        except FileNotFoundError:
+            pass
+        with self.lock:
+            self.counters["encoded_misses"] += 1
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        encode(tmp_path)
+        os.replace(tmp_path, path)
+        self.evict_disk(keep=path)
+        return path
+
+    def remember(self, key, df):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.max_memory_bytes:
+            return  # Would evict everything else; served from disk instead
+        with self.lock:
+            if key in self.memory:
+                self.memory_bytes -= self.memory.pop(key)[1]
+            self.memory[key] = (df, nbytes)
+            self.memory_bytes += nbytes
+            while len(self.memory) > self.max_memory_items or self.memory_bytes > self.max_memory_bytes:
+                self.memory_bytes -= self.memory.popitem(last=False)[1][1]
+                self.counters["memory_evictions"] += 1
+
+    def read_disk(self, key):
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)  # Mark as recently used for eviction
+            return df
+        except Exception as e:
+            logger.warning(f"Dropping unreadable cache file {path}: {e}")
+            os.remove(path)
+            return None
+
+    def write_disk(self, key, df):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self.path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self.path(key))
+            self.evict_disk()
+        except Exception as e:
+            logger.warning(f"Could not write dataset cache entry {key}: {e}")
+
+    def disk_entries(self):
+        """Cache files as (mtime, size, path), oldest first."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith((".parquet", ".csv")):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # Evicted by another process meanwhile
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict_disk(self, keep=None):
+        entries = self.disk_entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self.lock:
+                self.counters["disk_evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.memory_bytes = 0
+        for _, _, path in self.disk_entries():
+            os.remove(path)
+
+    def stats(self):
+        entries = self.disk_entries()
+        with self.lock:
+            return {
+                **self.counters,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory_bytes,
+                "disk_entries": len(entries),
+                "disk_bytes": sum(size for _, size, _ in entries)
+            }
@@ -1 +1 @@
-from .models import Commodity, DatabaseService, Base
\ No newline at end of file
+from .models import Commodity, CommodityPriceTick, DatabaseService, Base, upsert_commodities, read_latest_commodities, commodity_frame_records, append_price_ticks, iter_price_history, partition_price_ticks_monthly
\ No newline at end of file
@@ -3,74 +3,186 @@ import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
-import joblib
+import copy
+import os
+import time
+from datetime import datetime
+from calendar_features import build_calendar
+import pyarrow.parquet as pq
+from partitioned_dataset import dataset_columns, is_partitioned_dataset, read_partitioned
+from .feature_encoder import FeatureEncoder
+from .model_registry import ModelRegistry
+
+CATEGORICAL_FEATURES = ['Province', 'Health_Center', 'ATC_Code', 'Season', 'Supply_Chain_Delay', 'Center_Type', 'Income_Level', 'Population_Density']
+NON_FEATURE_COLUMNS = ['units_sold', 'Date', 'Drug_ID', 'sale_timestamp', 'stock_entry_timestamp', 'expiration_date']
+
+# Declared dtypes of the sales dataset: categoricals for strings, int16/int32 for counts, float32 for prices
+SALES_SCHEMA = {
+    'Drug_ID': 'category', 'ATC_Code': 'category', 'Province': 'category', 'Population_Density': 'category',
+    'Income_Level': 'category', 'Pharmacy_Type': 'category', 'Health_Center': 'category', 'Center_Type': 'category',
+    'Supply_Chain_Delay': 'category', 'Season': 'category',
+    'units_sold': 'int32', 'available_stock': 'int32',
+    'Effectiveness_Rating': 'int16', 'Promotion': 'int16', 'Holiday_Week': 'int16', 'Competitor_Count': 'int16',
+    'Time_On_Market': 'int16',
+    'Price_Per_Unit': 'float32', 'Availability_Score': 'float32', 'Disease_Outbreak': 'float32'
+}
+
+# Written by the generators but never used as features, so never read
+TIMESTAMP_COLUMNS = ['sale_timestamp', 'stock_entry_timestamp', 'expiration_date']
+
+# Calendar features joined onto the sales rows by Date
+CALENDAR_FEATURES = ['Month', 'DayOfWeek']
+
+
+def without_timestamps(columns):
+    return [col for col in columns if col not in TIMESTAMP_COLUMNS]
+
+
+def apply_sales_schema(df):
+    """Cast the columns of df declared in SALES_SCHEMA that do not have their declared dtype yet."""
+    return df.astype({col: dtype for col, dtype in SALES_SCHEMA.items() if col in df.columns and str(df[col].dtype) != dtype})
+
+
+def read_sales(path, provinces=None, start_date=None, end_date=None):
+    """Read a sales dataset (CSV, Parquet or partitioned directory) with the SALES_SCHEMA dtypes and no timestamp columns."""
+    if is_partitioned_dataset(path):
+        columns = without_timestamps(dataset_columns(path))
+        return apply_sales_schema(read_partitioned(path, provinces, start_date, end_date, columns=columns))
+    # Parquet keeps categoricals dictionary-encoded and dates as native timestamps, so nothing is re-parsed
+    if str(path).endswith('.parquet'):
+        return apply_sales_schema(pd.read_parquet(path, columns=without_timestamps(pq.read_schema(path).names)))
+    # "None" is a Supply_Chain_Delay level, not a missing value
+    return pd.read_csv(
+        path, usecols=lambda col: col not in TIMESTAMP_COLUMNS, dtype=SALES_SCHEMA, parse_dates=['Date'],
+        keep_default_na=False, na_values=['']
+    )
+
+
+def with_calendar_features(df):
+    """df with the CALENDAR_FEATURES it lacks, computed once per distinct date and joined on Date."""
+    missing = [col for col in CALENDAR_FEATURES if col not in df.columns]
+    if not missing:
+        return df
+    calendar = build_calendar(df['Date'].min(), df['Date'].max())
+    return df.join(calendar[missing], on='Date')
+
+
+# Trained models and their fitted encoders, one directory per version
+MODEL_REGISTRY = ModelRegistry(os.environ.get(
+    'MODEL_REGISTRY_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model_registry')
+))
+
 
 class DemandForecaster:
-    def __init__(self, data_path):
+    def __init__(self, data_path, provinces=None, start_date=None, end_date=None, model_version=None, registry=None):
         self.data_path = data_path
+        # Only used for partitioned datasets, where they select which partitions are read
+        self.provinces = provinces
+        self.start_date = start_date
+        self.end_date = end_date
         self.model = None
-        self.feature_names = None
+        self.encoder = None
+        self.train_seconds = None
+        # None loads the latest registered version
+        self.model_version = model_version
+        self.registry = registry or MODEL_REGISTRY
+
+    @property
+    def feature_names(self):
+        return self.encoder.feature_names if self.encoder is not None else None
+
+    def read_data(self):
+        return read_sales(self.data_path, self.provinces, self.start_date, self.end_date)
 
-    def load_and_preprocess(self):
-        df = pd.read_csv(self.data_path, parse_dates=['Date'])
+    def read_features(self):
         # Feature engineering: encode categorical variables, extract season, etc.
-        df['Month'] = df['Date'].dt.month
-        df['DayOfWeek'] = df['Date'].dt.dayofweek
-        df = pd.get_dummies(df, columns=['Province', 'Health_Center', 'ATC_Code', 'Season', 'Supply_Chain_Delay', 'Center_Type', 'Income_Level', 'Population_Density'])
-        self.feature_names = [col for col in df.columns if col not in ['units_sold', 'Date', 'Drug_ID', 'sale_timestamp', 'stock_entry_timestamp', 'expiration_date']]
-        X = df[self.feature_names]
+        return with_calendar_features(self.read_data())
+
+    def load_and_preprocess(self, window_days=None, refit_encoder=True):
+        df = self.read_features()
+        if window_days is not None:
+            # Only the most recent window_days days of sales
+            df = df[df['Date'] > df['Date'].max() - pd.Timedelta(days=window_days)]
+        # One-hot encoding is fitted on the training data and reused as is for prediction
+        if refit_encoder or self.encoder is None:
+            self.encoder = FeatureEncoder(CATEGORICAL_FEATURES, NON_FEATURE_COLUMNS).fit(df)
+        X = self.encoder.transform(df)
         y = df['units_sold']
         return X, y, df
 
-    def train(self):
-        X, y, _ = self.load_and_preprocess()
+    def train(self, window_days=None, warm_start=False, new_estimators=20, n_jobs=-1):
+        """Fit the forest on all cores (n_jobs=-1) and register it as a new version; returns the test MSE.
+
+        window_days limits training to the most recent days of sales. warm_start keeps the trees of
+        the current model (and its encoder) and fits new_estimators more trees on the data.
+        """
+        if warm_start:
+            self.load_model()
+            # The registry's loaded model is shared, so grow a copy
+            model = copy.deepcopy(self.model)
+            model.set_params(warm_start=True, n_estimators=model.n_estimators + new_estimators, n_jobs=n_jobs)
+            base_version = self.model_version
+        else:
+            model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs)
+            base_version = None
+        X, y, _ = self.load_and_preprocess(window_days, refit_encoder=not warm_start)
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.model.fit(X_train, y_train)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        train_seconds = time.perf_counter() - start
+        self.model = model
         y_pred = self.model.predict(X_test)
         mse = mean_squared_error(y_test, y_pred)
-        print(f"Test MSE: {mse:.2f}")
-        joblib.dump(self.model, 'demand_forecast_model.pkl')
+        print(f"Test MSE: {mse:.2f} ({len(model.estimators_)} trees on {len(y_train)} rows, fitted in {train_seconds:.2f}s)")
+        self.train_seconds = train_seconds
+        self.model_version = self.registry.save(self.model, self.encoder, {
+            'data_path': str(self.data_path), 'trained_at': datetime.now().isoformat(), 'rows': len(y), 'test_mse': mse,
+            'train_seconds': train_seconds, 'n_estimators': len(model.estimators_), 'window_days': window_days,
+            'warm_started_from': base_version
+        })
         return mse
 
-    def feature_importance(self):
+    def load_model(self):
         if self.model is None:
-            self.model = joblib.load('demand_forecast_model.pkl')
+            self.model_version, self.model, self.encoder = self.registry.load(self.model_version)
+
+    def feature_importance(self):
+        self.load_model()
         importances = self.model.feature_importances_
         return sorted(zip(self.feature_names, importances), key=lambda x: x[1], reverse=True)
 
     def predict(self, future_df):
-        if self.model is None:
-            self.model = joblib.load('demand_forecast_model.pkl')
-        X_future = future_df[self.feature_names]
+        """Predict units sold for rows of the sales dataset, an encoded DataFrame or an encoded matrix.
+
+        Sales rows (as read_sales returns them) get the calendar features added from Date and are
+        encoded with the model's encoder. A DataFrame holding every column of feature_names is
+        taken as already encoded, and a matrix must have its columns in feature_names order.
+        """
+        self.load_model()
+        if isinstance(future_df, pd.DataFrame):
+            if set(self.feature_names).issubset(future_df.columns):
+                X_future = future_df[self.feature_names].to_numpy(dtype=np.float32)
+            else:
+                X_future = self.encoder.transform(with_calendar_features(future_df))
+        else:
+            X_future = future_df
         return self.model.predict(X_future)
 
     def restock_recommendation(self, days_ahead=7):
-        # Example: recommend restock based on predicted demand for next N days
-        _, _, df = self.load_and_preprocess()
-        last_date = df['Date'].max()
-        recommendations = {}
-        for drug in df['Drug_ID'].unique():
-            drug_df = df[df['Drug_ID'] == drug].copy()
-            # Create future dates
-            future_dates = pd.date_range(last_date + pd.Timedelta(days=1), periods=days_ahead)
-            # Use last known values for categorical features
-            last_row = drug_df.iloc[-1]
-            future_rows = []
-            for date in future_dates:
-                row = last_row.copy()
-                row['Date'] = date
-                row['Month'] = date.month
-                row['DayOfWeek'] = date.dayofweek
-                future_rows.append(row)
-            future_df = pd.DataFrame(future_rows)
-            # One-hot encode as before
-            future_df = pd.get_dummies(future_df)
-            # Align columns
-            for col in self.feature_names:
-                if col not in future_df:
-                    future_df[col] = 0
-            future_df = future_df[self.feature_names]
-            pred = self.model.predict(future_df)
-            recommendations[drug] = int(np.sum(pred))
-        return recommendations
+        # Recommend restock from the predicted demand of every drug over the next N days,
+        # holding each drug's last known features and moving only the calendar columns
+        self.load_model()
+        df = self.read_features()
+        last_rows = df.groupby('Drug_ID', sort=False, observed=True).tail(1)
+        future_dates = pd.date_range(df['Date'].max() + pd.Timedelta(days=1), periods=days_ahead)
+
+        # (drug, day, feature) grid built by broadcasting the encoded last rows over the horizon
+        last_features = self.encoder.transform(last_rows)
+        future = np.repeat(last_features[:, None, :], days_ahead, axis=1)
+        future[:, :, self.feature_names.index('Month')] = future_dates.month.to_numpy()
+        future[:, :, self.feature_names.index('DayOfWeek')] = future_dates.dayofweek.to_numpy()
+
+        # One predict call for all drugs, then the demand summed per drug
+        pred = self.predict(future.reshape(-1, len(self.feature_names)))
+        totals = pd.Series(pred).groupby(np.repeat(np.arange(len(last_rows)), days_ahead)).sum()
+        return {drug: int(total) for drug, total in zip(last_rows['Drug_ID'].tolist(), totals.to_numpy())}
@@ -0,0 +1,106 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# Input dtype kinds transform() accepts for each fitted kind: integer columns take integers or
+# booleans, float columns any real number. Casting instead could silently wrap or truncate values.
+COMPATIBLE_KINDS = {"b": "b", "i": "biu", "u": "biu", "f": "biuf"}
+
+
+class FeatureEncoder:
+    """Fitted one-hot encoding of the forecaster's input columns that can be saved with the model.
+
+    fit() fixes the numeric columns and their dtypes, the vocabulary of every categorical column
+    and the output column order, which is the order pd.get_dummies would produce: numeric columns
+    as they appear in the frame, then one column per category, sorted. transform() rejects numeric
+    columns whose dtype does not fit the fitted one (e.g. strings where integers were fitted) and
+    writes rows straight into a preallocated float32 matrix; categories not seen in fit encode as
+    all zeros.
+    """
+
+    def __init__(self, categorical_columns, exclude_columns=()):
+        self.categorical_columns = list(categorical_columns)
+        self.exclude_columns = list(exclude_columns)
+        self.numeric_columns = []
+        self.numeric_dtypes = {}
+        self.vocabularies = {}
+
+    @property
+    def feature_names(self):
+        return self.numeric_columns + [
+            f"{col}_{value}" for col in self.categorical_columns for value in self.vocabularies[col]
+        ]
+
+    def fit(self, df):
+        skip = set(self.categorical_columns) | set(self.exclude_columns)
+        self.numeric_columns = [col for col in df.columns if col not in skip]
+        self.numeric_dtypes = {col: str(df[col].dtype) for col in self.numeric_columns}
+        self.vocabularies = {}
+        for col in self.categorical_columns:
+            values = df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                categories = values.cat.remove_unused_categories().cat.categories.sort_values()
+            else:
+                categories = pd.Index(values.dropna().unique()).sort_values()
+            self.vocabularies[col] = categories.tolist()
+        return self
+
+    def transform(self, df):
+        """(rows, features) float32 matrix of df, in feature_names order."""
+        n_numeric = len(self.numeric_columns)
+        X = np.zeros((len(df), len(self.feature_names)), dtype=np.float32)
+        if n_numeric:
+            numeric = df[self.numeric_columns]
+            self.check_numeric_dtypes(numeric)
+            X[:, :n_numeric] = numeric.to_numpy(dtype=np.float32)
+        rows = np.arange(len(df))
+        offset = n_numeric
+        for col in self.categorical_columns:
+            vocabulary = pd.Index(self.vocabularies[col])
+            values = df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Look up each category once and map the integer codes (-1, missing, stays -1)
+                lookup = np.append(vocabulary.get_indexer(values.cat.categories), -1)
+                codes = lookup[values.cat.codes.to_numpy()]
+            else:
+                codes = vocabulary.get_indexer(values)
+            known = codes >= 0
+            X[rows[known], offset + codes[known]] = 1
+            offset += len(vocabulary)
+        return X
+
+    def check_numeric_dtypes(self, df):
+        mismatched = []
+        for col, fitted in self.numeric_dtypes.items():
+            fitted_kind = pd.api.types.pandas_dtype(fitted).kind
+            if df[col].dtype.kind not in COMPATIBLE_KINDS.get(fitted_kind, fitted_kind):
+                mismatched.append(f"{col} ({df[col].dtype}, fitted as {fitted})")
+        if mismatched:
+            raise ValueError(f"Numeric feature columns do not match the fitted dtypes: {', '.join(mismatched)}")
+
+    def to_dict(self):
+        return {
+            "categorical_columns": self.categorical_columns,
+            "exclude_columns": self.exclude_columns,
+            "numeric_columns": self.numeric_columns,
+            "numeric_dtypes": self.numeric_dtypes,
+            "vocabularies": self.vocabularies
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        encoder = cls(state["categorical_columns"], state["exclude_columns"])
+        encoder.numeric_columns = state["numeric_columns"]
+        encoder.numeric_dtypes = state["numeric_dtypes"]
+        encoder.vocabularies = state["vocabularies"]
+        return encoder
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+import joblib
+
+from .feature_encoder import FeatureEncoder
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.joblib"
+ENCODER_FILE = "features.json"
+METADATA_FILE = "metadata.json"
+VERSION_PATTERN = re.compile(r"^v(\d+)$")
+
+
+class ModelRegistry:
+    """Versioned model artifacts on disk (root/v0001/, root/v0002/, ...) with an LRU of loaded versions.
+
+    Each version directory holds the joblib-dumped model, its fitted FeatureEncoder and a metadata
+    file, and is written to a temporary directory first so a half-saved version is never visible.
+    Models are stored uncompressed and loaded with mmap_mode='r', which reads the large numpy
+    arrays straight from the page cache instead of through a copy. Loaded models are shared between
+    callers and must not be modified in place.
+    """
+
+    def __init__(self, root, max_loaded=4, mmap_mode="r"):
+        self.root = root
+        self.max_loaded = max_loaded
+        self.mmap_mode = mmap_mode
+        self.loaded = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "loads": 0, "evictions": 0}
+
+    def versions(self):
+        """Saved versions, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        found = [(int(m.group(1)), name) for name in os.listdir(self.root) if (m := VERSION_PATTERN.match(name))]
+        return [name for _, name in sorted(found)]
+
+    def latest_version(self):
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def save(self, model, encoder, metadata=None):
+        """Store a new version and return its name."""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        try:
+            joblib.dump(model, os.path.join(tmp_dir, MODEL_FILE))
+            encoder.save(os.path.join(tmp_dir, ENCODER_FILE))
+            with open(os.path.join(tmp_dir, METADATA_FILE), "w") as f:
+                json.dump(metadata or {}, f, indent=2, default=str)
+            while True:
+                latest = self.latest_version()
+                version = f"v{int(latest[1:]) + 1 if latest else 1:04d}"
+                try:
+                    os.rename(tmp_dir, os.path.join(self.root, version))
+                    break
+                except OSError:
+                    if not os.path.exists(os.path.join(self.root, version)):
+                        raise
+                    # Another process saved this version first; take the next one
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        logger.info(f"Saved model version {version} to {self.root}")
+        return version
+
+    def load(self, version=None):
+        """(version, model, encoder) for version, or the latest one; served from the LRU when loaded."""
+        version = version or self.latest_version()
+        if version is None:
+            raise FileNotFoundError(f"No model versions in {self.root}")
+        with self.lock:
+            if version in self.loaded:
+                self.loaded.move_to_end(version)
+                self.counters["hits"] += 1
+                return (version, *self.loaded[version])
+
+        version_dir = os.path.join(self.root, version)
+        model = joblib.load(os.path.join(version_dir, MODEL_FILE), mmap_mode=self.mmap_mode)
+        encoder = FeatureEncoder.load(os.path.join(version_dir, ENCODER_FILE))
+        with self.lock:
+            self.counters["loads"] += 1
+            self.loaded[version] = (model, encoder)
+            self.loaded.move_to_end(version)
+            while len(self.loaded) > self.max_loaded:
+                self.loaded.popitem(last=False)
+                self.counters["evictions"] += 1
+        return version, model, encoder
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, METADATA_FILE)) as f:
+            return json.load(f)
+
+    def preload(self, versions=None):
+        """Load versions (default: the latest) into the LRU.
+
+        sklearn trees copy their node arrays out of the loaded file, so memory mapping alone does
+        not let worker processes share them. Call this in the parent process before forking workers
+        (e.g. gunicorn --preload) so they share the loaded models copy-on-write.
+        """
+        for version in versions or [self.latest_version()]:
+            if version is not None:
+                self.load(version)
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "loaded_versions": list(self.loaded), "saved_versions": len(self.versions())}
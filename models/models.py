@@ -1,20 +1,30 @@
-from sqlalchemy import Column, Float, Integer, String, create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import BigInteger, Column, Date, DateTime, Float, Index, Integer, String, UniqueConstraint, create_engine, func, insert, select, text, tuple_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import declarative_base, scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 Base = declarative_base()
 
+# Double precision (DOUBLE on MySQL), so stored prices read back exactly as parsed
+Number = Float(precision=53)
+
 class Commodity(Base):
     __tablename__ = 'commodity'
+    __table_args__ = (UniqueConstraint('agricultural', 'date', name='uq_commodity_quote'),)
     id = Column(Integer, primary_key=True, autoincrement=True)
-    agricultural = Column(String(255))
-    price = Column(Float)
-    day = Column(Float)
-    percentage = Column(Float)
-    weekly = Column(Float)
-    monthly = Column(Float)
-    ytd = Column(Float)
-    yoy = Column(Float)
-    date = Column(String(255))
+    agricultural = Column(String(255), nullable=False)
+    price = Column(Number)
+    day = Column(Number)
+    percentage = Column(Number)
+    weekly = Column(Number)
+    monthly = Column(Number)
+    ytd = Column(Number)
+    yoy = Column(Number)
+    date = Column(Date, nullable=False)
 
     def __repr__(self):
         return f"<Commodity(id={self.id}, name={self.name}, price={self.price}, unit={self.unit})>"
@@ -30,25 +40,204 @@ class Commodity(Base):
             'monthly': self.monthly,
             'ytd': self.ytd,
             'yoy': self.yoy,
-            'date': self.date
+            'date': self.date.isoformat() if self.date else None
+        }
+
+# A quote is identified by commodity name and quote date
+COMMODITY_KEY_COLUMNS = ['agricultural', 'date']
+COMMODITY_VALUE_COLUMNS = ['price', 'day', 'percentage', 'weekly', 'monthly', 'ytd', 'yoy']
+
+
+def commodity_upsert_statement(dialect_name):
+    """Bulk INSERT that updates the value columns of rows whose (agricultural, date) already exists."""
+    table = Commodity.__table__
+    if dialect_name == 'mysql':
+        stmt = mysql.insert(table)
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in COMMODITY_VALUE_COLUMNS})
+    if dialect_name in ('sqlite', 'postgresql'):
+        stmt = (sqlite if dialect_name == 'sqlite' else postgresql).insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=COMMODITY_KEY_COLUMNS,
+            set_={c: stmt.excluded[c] for c in COMMODITY_VALUE_COLUMNS}
+        )
+    raise ValueError(f"Commodity upsert is not supported for {dialect_name}")
+
+
+def upsert_commodities(session, rows):
+    """Insert new quotes and update changed ones in a single executemany; unchanged rows are not written.
+
+    rows are dicts with the key and value columns. Returns the number of rows sent to the database.
+    """
+    if not rows:
+        return 0
+    keys = [tuple(row[c] for c in COMMODITY_KEY_COLUMNS) for row in rows]
+    columns = [getattr(Commodity, c) for c in COMMODITY_KEY_COLUMNS + COMMODITY_VALUE_COLUMNS]
+    stored = {
+        tuple(values[:len(COMMODITY_KEY_COLUMNS)]): tuple(values[len(COMMODITY_KEY_COLUMNS):])
+        for values in session.query(*columns).filter(tuple_(Commodity.agricultural, Commodity.date).in_(keys))
+    }
+    changed = [
+        row for key, row in zip(keys, rows)
+        if stored.get(key) != tuple(row[c] for c in COMMODITY_VALUE_COLUMNS)
+    ]
+    if changed:
+        session.execute(commodity_upsert_statement(session.get_bind().dialect.name), changed)
+    return len(changed)
+
+
+def latest_commodities_select():
+    """Core SELECT of the most recent quote of every commodity (the highest id per name)."""
+    latest_ids = select(func.max(Commodity.id)).group_by(Commodity.agricultural)
+    return select(Commodity.__table__).where(Commodity.id.in_(latest_ids)).order_by(Commodity.id)
+
+
+def read_latest_commodities(session):
+    """Most recent quote of every commodity as a DataFrame, read with pd.read_sql without building ORM objects."""
+    return pd.read_sql(latest_commodities_select(), session.connection())
+
+
+def commodity_frame_records(df):
+    """Rows of a commodity DataFrame as JSON-ready dicts, shaped like Commodity.serialize()."""
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+class CommodityPriceTick(Base):
+    """Append-only history of every scraped quote, one row per commodity per refresh."""
+    __tablename__ = 'commodity_price_tick'
+    __table_args__ = (Index('ix_price_tick_commodity_ts', 'commodity', 'ts'),)
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    commodity = Column(String(255), nullable=False)
+    ts = Column(DateTime, nullable=False)
+    price = Column(Number)
+    day = Column(Number)
+    percentage = Column(Number)
+    weekly = Column(Number)
+    monthly = Column(Number)
+    ytd = Column(Number)
+    yoy = Column(Number)
+    quote_date = Column(Date)
+
+
+# Columns read back by the history queries: ts, quote_date, then the value columns
+PRICE_TICK_FIELDS = ['ts', 'quote_date'] + COMMODITY_VALUE_COLUMNS
+
+
+def append_price_ticks(session, rows, ts=None):
+    """Append one tick per scraped commodity row (dicts shaped like Commodity rows) stamped with ts."""
+    if not rows:
+        return 0
+    ts = ts or datetime.now()
+    ticks = [
+        {'commodity': row['agricultural'], 'ts': ts, 'quote_date': row['date'],
+         **{c: row[c] for c in COMMODITY_VALUE_COLUMNS}}
+        for row in rows
+    ]
+    session.execute(insert(CommodityPriceTick.__table__), ticks)
+    return len(ticks)
+
+
+def price_history_select(commodity, start, end=None):
+    """Core SELECT of one commodity's ticks with start <= ts (< end), oldest first."""
+    table = CommodityPriceTick.__table__
+    stmt = select(*[table.c[name] for name in PRICE_TICK_FIELDS]).where(table.c.commodity == commodity, table.c.ts >= start)
+    if end is not None:
+        stmt = stmt.where(table.c.ts < end)
+    return stmt.order_by(table.c.ts)
+
+
+def iter_price_history(session, commodity, start, end=None, batch_size=1000):
+    """Stream one commodity's ticks as JSON-ready dicts, fetching batch_size rows at a time."""
+    result = session.execute(price_history_select(commodity, start, end).execution_options(yield_per=batch_size))
+    for ts, quote_date, *values in result:
+        yield {
+            'commodity': commodity,
+            'ts': ts.isoformat(),
+            **dict(zip(COMMODITY_VALUE_COLUMNS, values)),
+            'quote_date': quote_date.isoformat() if quote_date else None
         }
 
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_price_ticks_monthly(engine, months_ahead=12, now=None):
+    """Range-partition commodity_price_tick by month of ts on MySQL, keeping months_ahead spare months.
+
+    The first call converts the table (the primary key becomes (id, ts), as MySQL requires the
+    partition column in every unique key) with one partition per month from the oldest tick.
+    Later calls split new months off the catch-all pmax partition. Other databases are left as is.
+    """
+    if engine.dialect.name != 'mysql':
+        return False
+    table = CommodityPriceTick.__tablename__
+    this_month = (now or datetime.now()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    with engine.begin() as conn:
+        names = [name for (name,) in conn.execute(text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION"), {'table': table})]
+        if names:
+            last = max(datetime.strptime(name[1:], '%Y%m') for name in names if name != 'pmax')
+            first = add_months(last, 1)
+        else:
+            oldest = conn.execute(text(f"SELECT MIN(ts) FROM {table}")).scalar()
+            first = min(oldest or this_month, this_month).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        stop = add_months(this_month, months_ahead + 1)
+        partitions = []
+        month = first
+        while month < stop:
+            partitions.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{add_months(month, 1):%Y-%m-%d}'))")
+            month = add_months(month, 1)
+        if not partitions:
+            return True
+        partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        if names:
+            conn.execute(text(f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ({', '.join(partitions)})"))
+        else:
+            conn.execute(text(
+                f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, ts) "
+                f"PARTITION BY RANGE (TO_DAYS(ts)) ({', '.join(partitions)})"))
+    return True
+
+
 class DatabaseService:
-    def __init__(self, db_url):
+    def __init__(self, db_url, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800, pool_pre_ping=True):
         self.db_url = db_url
-        self.engine = create_engine(db_url)
+        engine_options = {"pool_pre_ping": pool_pre_ping, "pool_recycle": pool_recycle}
+        url = make_url(db_url)
+        if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+            # Every backend but in-memory SQLite (SingletonThreadPool, no size settings) gets a sized QueuePool
+            engine_options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+        self.engine = create_engine(db_url, **engine_options)
         self.Base = Base
+        # One session per thread (request or scheduler job); call remove_session() when it is done
+        self.Session = scoped_session(sessionmaker(bind=self.engine))
 
     def create_engine(self):
         self.engine = create_engine(bind=self.engine)
         return self.engine
 
     def create_session(self):
-        from sqlalchemy.orm import sessionmaker
+        """The calling thread's session."""
         if not self.engine:
             raise Exception("Engine not created. Call create_engine() first.")
-        self.Session = sessionmaker(bind=self.engine)
         return self.Session()
+
+    def remove_session(self):
+        """Close the calling thread's session and return its connection to the pool."""
+        self.Session.remove()
+
+    def pool_stats(self):
+        pool = self.engine.pool
+        stats = {"pool": type(pool).__name__, "status": pool.status()}
+        if isinstance(pool, QueuePool):
+            stats.update(size=pool.size(), checked_in=pool.checkedin(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        return stats
+
     def create_all(self):
         if not self.engine:
             raise Exception("Engine not created. Call create_engine() first.")
@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+# Serializes publishing a version with retiring old ones; a lock older than the timeout is from a dead writer
+PUBLISH_LOCK = ".publish.lock"
+PUBLISH_LOCK_TIMEOUT = 60
+
+# Output formats of the synthetic sales generators and the file each one is saved to
+OUTPUT_FILES = {
+    "csv": "synthetic_pharma_sales.csv",
+    "parquet": "synthetic_pharma_sales.parquet",
+    "partitioned": "synthetic_pharma_sales_partitioned"  # Directory of province=/year=/month= Parquet files
+}
+
+# String columns stored dictionary-encoded in columnar output (each generator has a subset of them)
+CATEGORICAL_COLUMNS = [
+    "Drug_ID", "ATC_Code", "Province", "Population_Density", "Income_Level", "Health_Center",
+    "Center_Type", "Pharmacy_Type", "Supply_Chain_Delay", "Season"
+]
+
+
+def partition_path(province, year, month):
+    return os.path.join(f"province={province}", f"year={year:04d}", f"month={month:02d}")
+
+
+def stream_csv(chunks):
+    """Encode DataFrame chunks to CSV text, writing the header only once."""
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header)
+        header = False
+
+
+def save_dataset(df, output_format="csv", file_name=None):
+    """Save the dataset in the requested format (to its OUTPUT_FILES name by default) and return the file name."""
+    file_name = file_name or OUTPUT_FILES[output_format]
+    if output_format == "parquet":
+        # Categoricals are written as Parquet dictionaries and datetimes as native timestamps
+        df.astype({col: "category" for col in CATEGORICAL_COLUMNS if col in df.columns}).to_parquet(file_name, index=False)
+    else:
+        df.to_csv(file_name, index=False)
+    return file_name
+
+
+def publish_file(path, file_name):
+    """Atomically replace file_name with path's contents: a hard link where possible, otherwise a copy."""
+    tmp_path = f"{file_name}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(path, tmp_path)
+    except OSError:
+        shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, file_name)
+    return file_name
+
+
+def save_cached_dataset(cache, key, df, output_format="csv"):
+    """save_dataset that encodes each cached dataset once, then only relinks the shared output file."""
+    path = cache.get_or_encode(key, output_format, lambda tmp_path: save_dataset(df, output_format, tmp_path))
+    return publish_file(path, OUTPUT_FILES[output_format])
+
+
+def write_partitioned(chunks, output_dir):
+    """Write DataFrame chunks to a new province=/year=/month= Parquet version and return its manifest."""
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_dir = os.path.join(output_dir, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(tmp_dir)
+    partitions = {}
+    try:
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            dates = chunk["Date"]
+            groups = chunk.groupby([chunk["Province"], dates.dt.year.rename("year"), dates.dt.month.rename("month")], sort=False)
+            for (province, year, month), part in groups:
+                rel_dir = partition_path(province, int(year), int(month))
+                entry = partitions.setdefault(rel_dir, {
+                    "province": province, "year": int(year), "month": int(month),
+                    "files": [], "rows": 0, "min_date": None, "max_date": None
+                })
+                file_name = os.path.join(rel_dir, f"part-{len(entry['files']):05d}.parquet")
+                os.makedirs(os.path.join(tmp_dir, rel_dir), exist_ok=True)
+                part.to_parquet(os.path.join(tmp_dir, file_name), index=False)
+                min_date, max_date = part["Date"].min().strftime("%Y-%m-%d"), part["Date"].max().strftime("%Y-%m-%d")
+                entry["files"].append(file_name)
+                entry["rows"] += len(part)
+                entry["min_date"] = min(filter(None, [entry["min_date"], min_date]))
+                entry["max_date"] = max(filter(None, [entry["max_date"], max_date]))
+        manifest = publish_version(output_dir, tmp_dir, partitions)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    logger.info(f"Wrote {manifest['row_count']} rows in {len(manifest['partitions'])} partitions to {output_dir}/{manifest['version']}")
+    return manifest
+
+
+@contextmanager
+def publish_lock(dataset_dir):
+    """Hold dataset_dir's publish lock (a directory, so it also works on Windows); break it once stale."""
+    lock_dir = os.path.join(dataset_dir, PUBLISH_LOCK)
+    while True:
+        try:
+            os.mkdir(lock_dir)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_dir) > PUBLISH_LOCK_TIMEOUT:
+                    os.rmdir(lock_dir)
+            except OSError:
+                pass
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.rmdir(lock_dir)
+
+
+def publish_version(dataset_dir, tmp_dir, partitions):
+    """Move a finished tmp_dir into place as the newest version and point manifest.json at it."""
+    with publish_lock(dataset_dir):
+        # Named under the lock, so version order is publish order and the current version is always the newest
+        version = f"v-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        manifest = {
+            "version": version,
+            "partition_columns": ["province", "year", "month"],
+            "row_count": sum(entry["rows"] for entry in partitions.values()),
+            "partitions": [
+                {"path": path, **entry, "files": [os.path.join(version, name) for name in entry["files"]]}
+                for path, entry in sorted(partitions.items())
+            ]
+        }
+        os.rename(tmp_dir, os.path.join(dataset_dir, version))
+        tmp_manifest = os.path.join(dataset_dir, f".{MANIFEST_FILE}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_manifest, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_manifest, os.path.join(dataset_dir, MANIFEST_FILE))
+        retire_old_versions(dataset_dir, version)
+    # Deleting can take a while, so it happens after the lock is released
+    for name in os.listdir(dataset_dir):
+        if name.startswith(".trash-"):
+            shutil.rmtree(os.path.join(dataset_dir, name), ignore_errors=True)
+    return manifest
+
+
+def retire_old_versions(dataset_dir, current, keep_previous=1):
+    """Move all but the current and keep_previous newest versions (and legacy unversioned partitions) to .trash-* dirs."""
+    versions = sorted((name for name in os.listdir(dataset_dir) if name.startswith("v-") and name < current), reverse=True)
+    stale = versions[keep_previous:] + [name for name in os.listdir(dataset_dir) if name.startswith("province=")]
+    for name in stale:
+        os.rename(os.path.join(dataset_dir, name), os.path.join(dataset_dir, f".trash-{uuid.uuid4().hex}"))
+
+
+def is_partitioned_dataset(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def read_manifest(dataset_dir):
+    with open(os.path.join(dataset_dir, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def dataset_columns(dataset_dir):
+    """Column names of a partitioned dataset, from the schema of its first file."""
+    partitions = read_manifest(dataset_dir)["partitions"]
+    if not partitions:
+        return []
+    return pq.read_schema(os.path.join(dataset_dir, partitions[0]["files"][0])).names
+
+
+def select_partitions(manifest, provinces=None, start_date=None, end_date=None):
+    """Partitions of the manifest overlapping the given provinces and date range."""
+    start = pd.Timestamp(start_date).strftime("%Y-%m-%d") if start_date is not None else None
+    end = pd.Timestamp(end_date).strftime("%Y-%m-%d") if end_date is not None else None
+    selected = []
+    for entry in manifest["partitions"]:
+        if provinces is not None and entry["province"] not in provinces:
+            continue
+        if start is not None and entry["max_date"] < start:
+            continue
+        if end is not None and entry["min_date"] > end:
+            continue
+        selected.append(entry)
+    return selected
+
+
+def iter_partitioned(dataset_dir, provinces=None, start_date=None, end_date=None, columns=None):
+    """Generator of the matching partitions' rows; the manifest and filters are read on call, before any rows."""
+    entries = select_partitions(read_manifest(dataset_dir), provinces, start_date, end_date)
+    return read_partition_files(dataset_dir, entries, start_date, end_date, columns)
+
+
+def read_partition_files(dataset_dir, entries, start_date=None, end_date=None, columns=None):
+    """Yield the rows of the given partitions one file at a time, trimmed to the date range."""
+    filter_dates = start_date is not None or end_date is not None
+    read_columns = columns
+    if columns is not None and filter_dates and "Date" not in columns:
+        read_columns = list(columns) + ["Date"]
+    for entry in entries:
+        for file_name in entry["files"]:
+            df = pd.read_parquet(os.path.join(dataset_dir, file_name), columns=read_columns)
+            if start_date is not None:
+                df = df[df["Date"] >= pd.Timestamp(start_date)]
+            if end_date is not None:
+                df = df[df["Date"] <= pd.Timestamp(end_date)]
+            if read_columns is not columns:
+                df = df[columns]
+            yield df
+
+
+def read_partitioned(dataset_dir, provinces=None, start_date=None, end_date=None, columns=None):
+    """Read only the partitions needed for the given provinces and date range into one DataFrame."""
+    frames = list(iter_partitioned(dataset_dir, provinces, start_date, end_date, columns))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Master seed for everything random in the synthetic generators
+MASTER_SEED = int(os.environ.get("SYNTHETIC_SEED", "42"))
+
+# Top-level stream namespaces under the master seed
+DRUG_DATABASE_STREAM = 0
+DAILY_STREAM = 1
+TREND_STREAM = 2
+
+
+def stream_seed(seed, *path):
+    """SeedSequence for the sub-stream at path under seed, as repeated spawn() calls would hand it out."""
+    return np.random.SeedSequence(seed, spawn_key=tuple(int(p) for p in path))
+
+
+def stream_rng(seed, *path):
+    """Generator for the sub-stream at path under seed."""
+    return np.random.default_rng(stream_seed(seed, *path))
+
+
+def daily_uniforms(seed, path, n_vars, inner_shape, date_range):
+    """Uniform [0, 1) draws of shape (n_vars, *inner_shape, len(date_range)), one stream per calendar month."""
+    inner_shape = tuple(inner_shape)
+    out = np.empty((n_vars, *inner_shape, len(date_range)))
+    if len(date_range) == 0:
+        return out
+    month_keys = (date_range.year * 12 + date_range.month - 1).to_numpy()
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(month_keys)) + 1])
+    stops = np.append(starts[1:], len(date_range))
+    for start, stop in zip(starts, stops):
+        first = date_range[start]
+        block = stream_rng(seed, *path, month_keys[start]).random((n_vars, *inner_shape, first.days_in_month))
+        offset = first.day - 1
+        out[..., start:stop] = block[..., offset:offset + (stop - start)]
+    return out
+
+
+def scaled_integers(u, low, high):
+    """Map uniform [0, 1) draws to integers in [low, high), like Generator.integers(low, high)."""
+    return (low + np.floor(u * (np.asarray(high) - low))).astype(np.int64)
+
+
+def label_column(labels, codes):
+    """Expand a short list of labels to a full column by integer codes, keeping the default string dtype."""
+    return pd.Index(labels).take(codes)
+
+
+def seed_from_request(value, default=MASTER_SEED):
+    """Parse an optional seed query parameter, raising ValueError unless it is a non-negative integer."""
+    if value in (None, ""):
+        return default
+    if not value.isdigit():
+        raise ValueError(f"seed must be a non-negative integer, got {value!r}")
+    return int(value)
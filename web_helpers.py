@@ -0,0 +1,30 @@
+import logging
+from datetime import datetime
+
+from flask import Response, jsonify, stream_with_context
+
+from partitioned_dataset import is_partitioned_dataset, iter_partitioned, stream_csv
+
+logger = logging.getLogger(__name__)
+
+
+def download_partitions(dataset_dir, args):
+    """Response streaming the partitions matching the optional province/start_date/end_date args as CSV."""
+    if not is_partitioned_dataset(dataset_dir):
+        logger.error(f"{dataset_dir} not found")
+        return jsonify({"error": "File not found!"}), 404
+    # Checked before streaming starts; an error inside the stream would truncate a 200 response
+    dates = {}
+    for name in ('start_date', 'end_date'):
+        value = args.get(name)
+        try:
+            dates[name] = datetime.strptime(value, '%Y-%m-%d') if value else None
+        except ValueError:
+            return jsonify({"error": f"{name} must be in YYYY-MM-DD format, got {value!r}"}), 400
+    province = args.get('province')
+    frames = iter_partitioned(dataset_dir, provinces=[province] if province else None, **dates)
+    return Response(
+        stream_with_context(stream_csv(frames)),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=synthetic_pharma_sales.csv"}
+    )